@@ -0,0 +1,256 @@
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+'''Mock Merit API
+Local stand-in for the parts of the Merit v2 API that templates_creator uses, for benchmarks and offline runs:
+    POST  orgs/{orgId}/access                       basic auth -> orgAccessToken
+    GET   orgs/{orgId}/merittemplates?limit=&starting_after=   cursor paginated
+    GET   orgs/{orgId}/fields
+    POST  fields
+    POST  merittemplates
+    GET   merittemplates/{templateId}               includes enabledFieldSettings
+    PATCH merittemplates/{templateId}
+    POST  merittemplates/{templateId}/fields/{fieldId}
+Latency, a random 503 error rate, a requests-per-second limit (answered with 429 and Retry-After) and the token lifetime are configurable.
+GET /_stats returns request counts per endpoint; POST /_stats resets them.
+`mockMeritState.script` queues exact failure statuses for an endpoint, for tests that need a particular sequence of responses.
+'''
+class mockMeritState:
+    '''In-memory Org data and request statistics shared by all handler threads.'''
+    def __init__(self, latency=0.0, errorRate=0.0, rateLimit=None, tokenLifetime=3600, templates=0, fields=0, seed=0):
+        self.latency = latency
+        self.errorRate = errorRate
+        self.rateLimit = rateLimit
+        self.tokenLifetime = tokenLifetime
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.tokens = {}
+        self.templates = []
+        self.templatesById = {}
+        self.fields = []
+        self.settings = {}
+        self.windowStart = time.monotonic()
+        self.windowCount = 0
+        self.stats = {}
+        self.scripted = {}
+        for num in range(templates):
+            self.addTemplate({'title': 'Existing template ' + str(num), 'description': '', 'canOnlyBeSentOnce': False})
+        for num in range(fields):
+            self.addField({'name': 'Existing field ' + str(num), 'fieldType': 'ShortText', 'description': ''})
+
+    def newId(self):
+        return '%024x' % next(self.ids)
+
+    def addTemplate(self, payload):
+        template = {
+            'id': self.newId(),
+            'title': payload['title'],
+            'description': payload.get('description', ''),
+            'canOnlyBeSentOnce': payload.get('canOnlyBeSentOnce', False)
+        }
+        self.templates.append(template)
+        self.templatesById[template['id']] = template
+        return template
+
+    def addField(self, payload):
+        field = {
+            'id': self.newId(),
+            'fieldName': payload['name'],
+            'fieldType': payload['fieldType'],
+            'description': payload.get('description', '')
+        }
+        self.fields.append(field)
+        return field
+
+    def script(self, endpoint, *statuses):
+        '''Answers the next requests to `endpoint` (as in /_stats, e.g. 'POST orgs/{id}/access') with `statuses`, in order, before handling them normally.'''
+        with self.lock:
+            self.scripted.setdefault(endpoint, []).extend(statuses)
+
+    def count(self, endpoint, status):
+        key = endpoint + ' ' + str(status)
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+    def throttled(self):
+        '''Fixed one-second window limit; returns the seconds until the window resets when the limit is exceeded.'''
+        if not self.rateLimit:
+            return None
+        now = time.monotonic()
+        if now - self.windowStart >= 1.0:
+            self.windowStart = now
+            self.windowCount = 0
+        self.windowCount += 1
+        if self.windowCount > self.rateLimit:
+            return 1.0 - (now - self.windowStart)
+        return None
+
+class mockMeritHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out as separate writes; without this, delayed ACKs add ~40ms to every keep-alive response
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch()
+
+    def do_POST(self):
+        self.dispatch()
+
+    def do_PATCH(self):
+        self.dispatch()
+
+    def dispatch(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part][1:]
+        if parts == ['_stats']:
+            return self.statsEndpoint()
+        endpoint, handler = self.route(parts)
+        state = self.state
+        if state.latency:
+            time.sleep(state.latency * state.random.uniform(0.5, 1.5))
+        with state.lock:
+            wait = state.throttled()
+            if wait is not None:
+                return self.reply(endpoint, 429, {'error': 'rate limited'}, {'Retry-After': '%.3f' % wait})
+            if state.scripted.get(endpoint):
+                status = state.scripted[endpoint].pop(0)
+                return self.reply(endpoint, status, {'error': 'scripted failure'}, {'Retry-After': '0'} if status == 429 else None)
+            if state.errorRate and state.random.random() < state.errorRate:
+                return self.reply(endpoint, 503, {'error': 'injected failure'})
+            if handler is None:
+                return self.reply(endpoint, 404, {'error': 'not found'})
+            if endpoint != 'POST orgs/{id}/access' and not self.authorised():
+                return self.reply(endpoint, 401, {'error': 'invalid or expired orgAccessToken'})
+            status, response = handler(parts, parse_qs(url.query), body)
+        return self.reply(endpoint, status, response)
+
+    def route(self, parts):
+        method = self.command
+        routes = [
+            ('POST', ['orgs', None, 'access'], self.access),
+            ('GET', ['orgs', None, 'merittemplates'], self.listTemplates),
+            ('GET', ['orgs', None, 'fields'], self.listFields),
+            ('POST', ['fields'], self.createField),
+            ('POST', ['merittemplates'], self.createTemplate),
+            ('GET', ['merittemplates', None], self.getTemplate),
+            ('PATCH', ['merittemplates', None], self.updateTemplate),
+            ('POST', ['merittemplates', None, 'fields', None], self.setField),
+        ]
+        for routeMethod, pattern, handler in routes:
+            if method == routeMethod and len(pattern) == len(parts) and all(p is None or p == part for p, part in zip(pattern, parts)):
+                return method + ' ' + '/'.join(p or '{id}' for p in pattern), handler
+        return method + ' unknown', None
+
+    def authorised(self):
+        token = self.headers.get('Authorization', '')[len('Bearer '):]
+        expires = self.state.tokens.get(token)
+        return expires is not None and expires > time.monotonic()
+
+    def access(self, parts, query, body):
+        token = 'token-' + self.state.newId()
+        self.state.tokens[token] = time.monotonic() + self.state.tokenLifetime
+        return 200, {'orgAccessToken': token}
+
+    def listTemplates(self, parts, query, body):
+        limit = int(query.get('limit', ['100'])[0])
+        start = 0
+        if 'starting_after' in query:
+            after = query['starting_after'][0]
+            start = next((num + 1 for num, template in enumerate(self.state.templates) if template['id'] == after), 0)
+        page = self.state.templates[start:start + limit]
+        return 200, {
+            'merittemplates': page,
+            'paging': {
+                'pageInfo': {'hasNextPage': start + limit < len(self.state.templates)},
+                'cursors': {'after': page[-1]['id'] if page else None}
+            }
+        }
+
+    def listFields(self, parts, query, body):
+        return 200, {'fields': self.state.fields}
+
+    def createField(self, parts, query, body):
+        return 200, self.state.addField(body)
+
+    def createTemplate(self, parts, query, body):
+        return 200, self.state.addTemplate(body)
+
+    def getTemplate(self, parts, query, body):
+        template = self.state.templatesById.get(parts[1])
+        if template is None:
+            return 404, {'error': 'not found'}
+        return 200, dict(template, enabledFieldSettings=list(self.state.settings.get(parts[1], {}).values()))
+
+    def updateTemplate(self, parts, query, body):
+        template = self.state.templatesById.get(parts[1])
+        if template is None:
+            return 404, {'error': 'not found'}
+        template.update((key, body[key]) for key in ['description', 'canOnlyBeSentOnce'] if key in body)
+        return 200, template
+
+    def setField(self, parts, query, body):
+        if parts[1] not in self.state.templatesById:
+            return 404, {'error': 'not found'}
+        setting = dict(body, fieldId=parts[3])
+        self.state.settings.setdefault(parts[1], {})[parts[3]] = setting
+        return 200, setting
+
+    def statsEndpoint(self):
+        with self.state.lock:
+            if self.command == 'POST':
+                self.state.stats = {}
+            return self.reply(None, 200, self.state.stats)
+
+    def reply(self, endpoint, status, body, headers=None):
+        if endpoint:
+            self.state.count(endpoint, status)
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+def startMockMerit(port=0, **options):
+    '''Starts the mock API on a background thread. Returns (server, baseUrl); options are passed to `mockMeritState`.'''
+    handler = type('handler', (mockMeritHandler,), {'state': mockMeritState(**options)})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:' + str(server.server_port) + '/v2/'
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(description='Run a local mock of the Merit API endpoints used by templates_creator.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='mean seconds added to each request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--rate-limit', type=int, help='requests per second before answering 429')
+    parser.add_argument('--token-lifetime', type=float, default=3600, help='seconds an orgAccessToken stays valid')
+    parser.add_argument('--templates', type=int, default=0, help='existing templates to seed the Org with')
+    parser.add_argument('--fields', type=int, default=0, help='existing fields to seed the Org with')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parseArgs()
+    server, baseUrl = startMockMerit(args.port, latency=args.latency, errorRate=args.error_rate, rateLimit=args.rate_limit,
+                                     tokenLifetime=args.token_lifetime, templates=args.templates, fields=args.fields)
+    print('Mock Merit API listening on ' + baseUrl, flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,140 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import requests
+from queue import Empty
+try:
+    import resource
+except ImportError:
+    # not available on Windows; peak memory is then not reported
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import templates_creator
+from mock_merit_api import startMockMerit
+
+'''Benchmarks
+Generates synthetic template CSVs and runs templates_creator against the local mock Merit API, reporting wall time,
+API requests per template and peak memory (max RSS) for each combination of sheet size and worker count.
+The mock and each measured run get their own processes, so neither the mock nor earlier cases are counted against the run being measured.
+    python benchmarks/run_benchmarks.py --rows 100,1000,10000 --workers 1,8,32 --latency 0.02
+'''
+def generateCsv(path, rows, maxFields, fieldPool=200, seed=0):
+    '''Writes a valid sheet of `rows` templates, each using 0-`maxFields` fields drawn from `fieldPool` distinct field names.'''
+    rng = random.Random(seed)
+    header = templates_creator.headerRow
+    with open(path, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        for num in range(rows):
+            row = ['Benchmark template ' + str(num), 'Description ' + str(num), rng.choice(['TRUE', 'FALSE']), '', '']
+            for fieldNum in rng.sample(range(fieldPool), rng.randint(0, maxFields)):
+                row += ['Benchmark field ' + str(fieldNum), rng.choice(templates_creator.fieldTypes), 'Description',
+                        rng.choice(['TRUE', 'FALSE']), rng.choice(['TRUE', 'FALSE']), '']
+            row += [''] * (len(header) - len(row))
+            writer.writerow(row)
+
+def serveMock(queue, options):
+    server, baseUrl = startMockMerit(**options)
+    queue.put(baseUrl)
+    while True:
+        time.sleep(3600)
+
+def measureRun(queue, templatesCSV, baseUrl, workers, retries):
+    '''Child process body: one timed run, reporting (seconds, peak RSS in MB, failed rows).'''
+    quiet = templates_creator.textReporter(interval=3600, stream=open(os.devnull, 'w'))
+    started = time.perf_counter()
+    summary = templates_creator.run('benchmarkOrg', 'appId', 'appSecret', templatesCSV, baseUrl, workers, quiet, retries=retries)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024) if resource else None
+    queue.put((elapsed, peak, len(summary['failed'])))
+
+def waitForResult(queue, client, timeout):
+    '''Waits for the measured run's result, failing rather than hanging if the child dies without one or runs past `timeout` seconds.'''
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except Empty:
+            if client.exitcode is not None:
+                raise RuntimeError('benchmark run exited with code ' + str(client.exitcode) + ' without a result')
+            if time.monotonic() > deadline:
+                client.terminate()
+                raise RuntimeError('benchmark run did not finish within ' + str(timeout) + ' seconds')
+
+def runCase(templatesCSV, rows, workers, options, retries, timeout=3600):
+    '''Runs one benchmark case against a fresh mock Org and returns its measurements.'''
+    queue = multiprocessing.Queue()
+    mock = multiprocessing.Process(target=serveMock, args=(queue, options), daemon=True)
+    mock.start()
+    baseUrl = queue.get(timeout=30)
+    try:
+        client = multiprocessing.Process(target=measureRun, args=(queue, templatesCSV, baseUrl, workers, retries))
+        client.start()
+        elapsed, peak, failed = waitForResult(queue, client, timeout)
+        client.join()
+        if client.exitcode != 0:
+            raise RuntimeError('benchmark run exited with code ' + str(client.exitcode))
+        stats = requests.get(baseUrl + '_stats').json()
+    finally:
+        mock.terminate()
+        mock.join()
+    totalRequests = sum(stats.values())
+    return {
+        'rows': rows,
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'rowsPerSecond': round(rows / elapsed, 1) if elapsed else None,
+        'requests': totalRequests,
+        'requestsPerTemplate': round(totalRequests / rows, 2) if rows else None,
+        'peakMemoryMB': round(peak, 2) if peak is not None else None,
+        'failedRows': failed,
+        'requestsByEndpoint': stats
+    }
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark templates_creator against the local mock Merit API.')
+    parser.add_argument('--rows', default='100,1000', help='comma separated sheet sizes (default 100,1000)')
+    parser.add_argument('--max-fields', type=int, default=templates_creator.maxFields, help='fields per template are drawn from 0 to this')
+    parser.add_argument('--field-pool', type=int, default=200, help='distinct field names used across the sheet')
+    parser.add_argument('--workers', default='1,8', help='comma separated worker counts to compare (default 1,8)')
+    parser.add_argument('--latency', type=float, default=0.02, help='mean mock API latency in seconds (default 0.02)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of mock requests failing with 503')
+    parser.add_argument('--rate-limit', type=int, help='mock API requests per second before 429s')
+    parser.add_argument('--existing-templates', type=int, default=0, help='templates already in the mock Org')
+    parser.add_argument('--retries', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=3600, help='seconds before a single case is abandoned (default 3600)')
+    parser.add_argument('--output', help='also write the results as JSON to this path')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parseArgs(argv)
+    options = {'latency': args.latency, 'errorRate': args.error_rate, 'rateLimit': args.rate_limit,
+               'templates': args.existing_templates, 'seed': args.seed}
+    results = []
+    print('%8s %8s %10s %10s %10s %12s %10s %7s' % ('rows', 'workers', 'seconds', 'rows/sec', 'requests', 'req/template', 'peak MB', 'failed'))
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in [int(value) for value in args.rows.split(',')]:
+            templatesCSV = os.path.join(workdir, 'bench-' + str(rows) + '.csv')
+            generateCsv(templatesCSV, rows, args.max_fields, args.field_pool, args.seed)
+            for workers in [int(value) for value in args.workers.split(',')]:
+                result = runCase(templatesCSV, rows, workers, options, args.retries, args.timeout)
+                results.append(result)
+                print('%8d %8d %10.2f %10.1f %10d %12.2f %10s %7d' % (
+                    rows, workers, result['seconds'], result['rowsPerSecond'], result['requests'],
+                    result['requestsPerTemplate'], result['peakMemoryMB'], result['failedRows']), flush=True)
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump({'options': vars(args), 'results': results}, outfile, indent=2)
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,121 @@
+import argparse
+import bisect
+import contextlib
 import csv
+import io
+import itertools
 import json
+import os
+import random
+import sys
+import time
 import requests
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
-import PySimpleGUI as sg
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import threading
 import webbrowser
 
 '''Bulk Template Creator 
 Acts on a Merit Organization as an App to create templates in bulk.
-A properly formatted CSV must be used, and the relavent org and app IDs must be submitted in the popup. Note, existing fields will be used when found, replacing the data in the spreadsheet for that field.
+A properly formatted CSV must be used, and the relavent org and app IDs must be submitted in the popup or passed on the command line. Note, existing fields will be used when found, replacing the data in the spreadsheet for that field.
+PySimpleGUI is only imported when the popup flow is used (`--gui`, or no arguments), so the tool and `run` work on headless hosts.
 '''
+sg = None
+environments = {
+    'Staging': 'https://qwebhjklr-api.merits.com/v2/',
+    'Sandbox': 'https://sandbox-api.merits.com/v2/',
+    'Production': 'https://api.merits.com/v2/'
+}
+templateColumns = ['meritTemplate.title', 'meritTemplate.description', 'meritTemplate.canOnlyBeSentOnce', 'meritTemplate.coverPhotoId', 'meritTemplate.coverPhotoFileName']
+fieldColumns = ['field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits']
+maxFields = 35
+headerRow = templateColumns + fieldColumns * maxFields
+# JSON Lines records use the column names without their prefix: {"title": ..., "fields": [{"name": ..., "fieldType": ...}]}
+templateKeys = [column.split('.', 1)[1] for column in templateColumns]
+fieldKeys = [column.split('.', 1)[1] for column in fieldColumns]
+jsonLinesExtensions = ('.jsonl', '.ndjson')
+fieldTypes = ['ShortText', 'LongText', 'Date', 'Checkbox', 'Documents', 'Photos', 'Videos', 'Name']
+
+def normaliseName(name):
+    '''Name normalisation
+    Template titles and field names are matched after stripping leading/trailing whitespace and collapsing any run of internal whitespace to a single space.
+    Matching is otherwise exact and case sensitive, so 'Name' and 'name' are different fields.
+    '''
+    return ' '.join(name.split())
+
+class nameIndex:
+    '''Name index
+    Hash index of Org objects (templates or fields) keyed by their normalised name, built once from `getTemplates`/`getFields` and updated as objects are created.
+    `getOrCreate` is safe to call from several worker threads: the first caller for a missing name runs the creation while concurrent callers for that name wait on its result, so each name is created at most once per run.
+    '''
+    def __init__(self, items, nameKey):
+        self.nameKey = nameKey
+        self.items = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        for item in items:
+            self.items.setdefault(normaliseName(item[nameKey]), item)
+
+    def get(self, name):
+        '''Returns the indexed object for `name`, or None.'''
+        return self.items.get(normaliseName(name))
+
+    def add(self, item):
+        '''Adds or replaces an object in the index.'''
+        with self.lock:
+            self.items[normaliseName(item[self.nameKey])] = item
+
+    def getOrCreate(self, name, create):
+        '''Returns the indexed object for `name`, calling `create()` to make it if it is not indexed yet.'''
+        key = normaliseName(name)
+        with self.lock:
+            if key in self.items:
+                return self.items[key]
+            waiting = self.pending.get(key)
+            owner = waiting is None
+            if owner:
+                waiting = self.pending[key] = Future()
+        if not owner:
+            return waiting.result()
+        try:
+            item = create()
+        except BaseException as error:
+            with self.lock:
+                del self.pending[key]
+            waiting.set_exception(error)
+            raise
+        with self.lock:
+            self.items[key] = item
+            del self.pending[key]
+        waiting.set_result(item)
+        return item
+
+    def __len__(self):
+        return len(self.items)
+
+class orgRun:
+    '''Org state
+    Everything a run against one Org works with: its orgId, the `meritSession` logged in to it, the name indexes of its templates and fields, and its journal.
+    Kept per Org rather than in module globals so several Orgs can be run side by side in one process.
+    '''
+    def __init__(self, orgId, session, templateIndex=None, fieldIndex=None, journal=None):
+        self.orgId = orgId
+        self.session = session
+        self.templateIndex = templateIndex
+        self.fieldIndex = fieldIndex
+        self.journal = journal
+
 class newTemplate:
     '''Template class
-    A new instance of this class will be created for each valid row in the input file.
+    A new instance of this class will be created for each template in the input file, holding only the fields that template uses.
+    Lookup/creation against Merit is not done on construction; call `meritTemplateExists` once the template's fields have been resolved.
+    Rows are held by the thousand while in flight, so this and `newField` use `__slots__` rather than a per-instance dict.
     '''
+    __slots__ = ('templateId', 'title', 'description', 'canOnlyBeSentOnce', 'coverPhotoId', 'coverPhotoFileName', 'additionalFields')
+
     def __init__(self, templateId, title, description, canOnlyBeSentOnce, coverPhotoId, coverPhotoFileName, additionalFields):
         self.templateId = templateId
         self.title = title
@@ -24,15 +127,14 @@ class newTemplate:
         self.coverPhotoId = coverPhotoId
         self.coverPhotoFileName = coverPhotoFileName
         self.additionalFields = additionalFields
-        self.meritTemplateExists()
 
-    def createTemplate(self):
+    def createTemplate(self, org):
         '''Template Creation
-        Create a new template via API call to Merit; append returned ID to self.
+        Create a new template on `org` via API call to Merit; append returned ID to self and return the template as it should be indexed.
         '''
-        url = s.url + "merittemplates"
+        url = org.session.url + "merittemplates"
         payload = {
-            'orgId': orgId,
+            'orgId': org.orgId,
             'title': self.title,
             'description': self.description,
             'canOnlyBeSentOnce': self.canOnlyBeSentOnce,
@@ -43,17 +145,22 @@ class newTemplate:
         headers = {
             'Content-Type': "application/json"
         }
-        r = s.post(url, data=json.dumps(payload), headers=headers).json()
+        r = org.session.post(url, data=json.dumps(payload), headers=headers).json()
         self.templateId = r['id']
-        return
+        meritTemplate = {
+            'id': self.templateId,
+            'title': self.title,
+            'description': self.description,
+            'canOnlyBeSentOnce': self.canOnlyBeSentOnce
+        }
+        if org.journal:
+            org.journal.record('template', meritTemplate)
+        return meritTemplate
 
-    def meritTemplateExists(self):
-        '''Check if that template already exists by matching the `title`; update `id` and `description` if so. Create if not.'''
-        for meritTemplate in orgTemplates:
-            if self.title == meritTemplate['title']:
-                self.templateId = meritTemplate['id']
-                return
-        self.createTemplate()
+    def meritTemplateExists(self, org):
+        '''Check if that template already exists by looking up the `title` in the Org's `templateIndex`; update `id` if so. Create if not.'''
+        meritTemplate = org.templateIndex.getOrCreate(self.title, lambda: self.createTemplate(org))
+        self.templateId = meritTemplate['id']
         return
 
     def toDict(self):
@@ -70,7 +177,10 @@ class newTemplate:
 class newField:
     '''Class for additional fields
     All fields will be created as an instance of this class, and then appended to the template once complete.
+    Call `fieldExists` to resolve the field against the Org (creating it if needed) before it is used in a field setting.
     '''
+    __slots__ = ('fieldId', 'fieldName', 'fieldType', 'description', 'newEnabled', 'newRequired', 'newValueForAllMerits')
+
     def __init__(self, fieldId, fieldName, fieldType, description, newEnabled, newRequired, newValueForAllMerits):
         self.fieldId = fieldId
         self.fieldName = fieldName
@@ -85,28 +195,24 @@ class newField:
         if newRequired == 'TRUE':
             self.newRequired = True
         self.newValueForAllMerits = newValueForAllMerits
-        self.fieldExists()
 
-    def fieldExists(self):
+    def fieldExists(self, org):
         '''Field Exists
-        Checks if a given field exists by checking for its name in the list of Org Fields.
+        Checks if a given field exists by looking up its name in the Org's `fieldIndex`, creating it if not.
         '''
-        for field in fieldsList:
-            if self.fieldName == field['fieldName']:
-                self.fieldId = field['id']
-                self.fieldType = field['fieldType']
-                self.description = field['description']
-                return
-        fieldsList.append(self.createField())
+        field = org.fieldIndex.getOrCreate(self.fieldName, lambda: self.createField(org))
+        self.fieldId = field['id']
+        self.fieldType = field['fieldType']
+        self.description = field['description']
         return
 
-    def createField(self):
+    def createField(self, org):
         '''Create New Fields
         If a field is included that does not already exist, this function will be called to create the field via an API call to Merit and update self.fieldId.
         '''
-        url = s.url + "fields"
+        url = org.session.url + "fields"
         payload = {
-            "orgId": orgId,
+            "orgId": org.orgId,
             "name": self.fieldName,
             "description": self.description,
             "fieldType": self.fieldType
@@ -114,9 +220,12 @@ class newField:
         headers = {
             'Content-Type': "application/json"
         }
-        r = s.post(url, data=json.dumps(payload), headers=headers).json()
+        r = org.session.post(url, data=json.dumps(payload), headers=headers).json()
         self.fieldId = r['id']
-        return self.toDict()
+        field = self.toDict()
+        if org.journal:
+            org.journal.record('field', field)
+        return field
 
     def toDict(self):
         '''Returns the newField instance as a Dict for consistent handling.'''
@@ -130,59 +239,359 @@ class newField:
             'newValueForAllMerits': self.newValueForAllMerits
         }
 
-def auth(orgId, appId, appSecret):
+def loadGui():
+    '''Imports PySimpleGUI on first use and returns it.'''
+    global sg
+    if sg is None:
+        import PySimpleGUI
+        sg = PySimpleGUI
+    return sg
+
+class textReporter:
+    '''Progress reporter
+    Writes progress and messages as plain text lines to `stream` (stderr by default).
+    Progress is throttled to at most one line every `interval` seconds per stage title, plus the final update, so large runs are not slowed down by output.
+    '''
+    def __init__(self, interval=2.0, stream=None):
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.started = time.monotonic()
+        self.lastUpdate = {}
+
+    def progress(self, title, done, total):
+        '''Reports `done` of `total` items, if `interval` has passed since the last report.'''
+        now = time.monotonic()
+        if done < total and now - self.lastUpdate.get(title, 0.0) < self.interval:
+            return
+        self.lastUpdate[title] = now
+        self.emitProgress(title, done, total, now - self.started)
+
+    def emitProgress(self, title, done, total, elapsed):
+        rate = done / elapsed if elapsed else 0.0
+        self.write('%s: %d/%d (%.1f rows/sec)' % (title, done, total, rate))
+
+    def message(self, text):
+        self.write(text)
+
+    def error(self, text):
+        self.write(text)
+
+    def plan(self, result):
+        '''Reports the change plan for one row of a dry run.'''
+        for op in result['plan']:
+            detail = ', '.join(key + '=' + json.dumps(value) for key, value in op.get('changes', {}).items())
+            self.write('Row ' + str(result['row']) + ': ' + op['action'] + ' ' +
+                       json.dumps(op.get('fieldName', op.get('title'))) + (' (' + detail + ')' if detail else ''))
+
+    def validation(self, rows, errors):
+        '''Reports the result of checking a whole sheet: every error, then a one line summary.'''
+        for error in errors:
+            self.error(error['message'] + ' [' + error['rule'] + ']')
+        self.message(validationSummary(rows, errors))
+
+    def linkApp(self, linkUrl):
+        '''Asks the user to link the app with the Org. Without an interactive terminal there is nobody to ask, so the run is stopped.'''
+        self.message('Please follow the below URL and link this app with the desired Org:\n' + linkUrl)
+        if not sys.stdin.isatty():
+            raise RuntimeError('App is not linked to this Org; link it at ' + linkUrl + ' and re-run.')
+        input('Press Enter once you have linked your Org to continue')
+
+    def write(self, text):
+        print(text, file=self.stream, flush=True)
+
+class jsonReporter(textReporter):
+    '''Progress reporter that writes one JSON object per line to `stream` (stdout by default), for other tools to consume.'''
+    def __init__(self, interval=2.0, stream=None):
+        textReporter.__init__(self, interval, stream or sys.stdout)
+
+    def emitProgress(self, title, done, total, elapsed):
+        self.write(json.dumps({'event': 'progress', 'stage': title, 'done': done, 'total': total, 'elapsed': round(elapsed, 3)}))
+
+    def message(self, text):
+        self.write(json.dumps({'event': 'message', 'message': text}))
+
+    def error(self, text):
+        self.write(json.dumps({'event': 'error', 'message': text}))
+
+    def validation(self, rows, errors):
+        for error in errors:
+            self.write(json.dumps(dict(error, event='validationError')))
+        self.write(json.dumps({'event': 'validation', 'rows': rows, 'valid': not errors, 'errors': len(errors)}))
+
+    def plan(self, result):
+        self.write(json.dumps({'event': 'plan', 'row': result['row'], 'title': result['title'], 'plan': result['plan']}))
+
+class guiReporter(textReporter):
+    '''Progress reporter using PySimpleGUI popups and a one line progress meter, for the popup flow.'''
+    def __init__(self, interval=0.2):
+        textReporter.__init__(self, interval)
+        loadGui()
+
+    def emitProgress(self, title, done, total, elapsed):
+        sg.OneLineProgressMeter(title, done, total, 'key', 'Total templates to be processed:')
+
+    def message(self, text):
+        sg.Popup(text)
+
+    def error(self, text):
+        if '\n' in text:
+            sg.PopupScrolled(text)
+        else:
+            sg.PopupError(text)
+
+    def validation(self, rows, errors):
+        '''Shows every error in one scrolling popup rather than a popup per error.'''
+        if errors:
+            sg.PopupScrolled('\n'.join([validationSummary(rows, errors)] + [error['message'] + ' [' + error['rule'] + ']' for error in errors]))
+        else:
+            sg.Popup(validationSummary(rows, errors))
+
+    def linkApp(self, linkUrl):
+        sg.Popup(
+            'Please click OK to follow the below URL and link this app with the desired Org:', linkUrl)
+        webbrowser.open_new(linkUrl)
+        sg.Popup(
+            'Click OK once you have linked your Org to continue')
+
+def validationSummary(rows, errors):
+    if not errors:
+        return 'CSV Successfully Validated. ' + str(rows) + ' rows checked.'
+    return 'CSV failed validation: ' + str(len(errors)) + ' errors in ' + str(len({error['row'] for error in errors})) + \
+        ' rows (' + str(rows) + ' rows checked).'
+
+def auth(session, orgId, appId, appSecret, reporter, linkApp=True):
     '''Auth
-    Takes orgId, appId, and appSecret as input to retreive an orgAccessToken via call to Merit API.
-    If the App has not been linked to this Org yet, it will request and provide the appLink URL then retry the orgAccessToken request.
-    The orgAccessToken is currently not rechecked after being successfully obtained, because no run of this script should exceed the 1hr expiry on the token.
+    Takes orgId, appId, and appSecret as input to retreive an orgAccessToken via call to Merit API, using `session`.
+    If the App has not been linked to this Org yet (401/403), it will request the appLink URL, hand it to `reporter.linkApp`, then retry the orgAccessToken request.
+    Without `linkApp` a 401/403 is raised as requests.HTTPError instead, as is any other error status once `session` has run out of retries.
+    Runs can outlast the 1hr expiry on the token; `meritSession` calls this again, without `linkApp`, when the API answers 401.
     '''
     while True:
-        rAuth = s.post(s.url + 'orgs/' + orgId + '/access',
+        rAuth = session.post(session.url + 'orgs/' + orgId + '/access',
                        auth=HTTPBasicAuth(appId, appSecret))
         statusCode = rAuth.status_code
         if statusCode == 200:
             orgAccessToken = rAuth.json()['orgAccessToken']
             return {'Authorization': 'Bearer ' + orgAccessToken}
-        if statusCode >= 400:
+        if statusCode not in (401, 403) or not linkApp:
+            rAuth.raise_for_status()
+            raise requests.HTTPError('Unexpected status ' + str(statusCode) + ' getting an orgAccessToken', response=rAuth)
+        if statusCode in (401, 403):
             # fetch applink url
             payload = {"requestedPermissions": [{"permissionType": "CanManageAllMeritTemplates"}, {
                 "permissionType": "CanSendAllMeritTemplates"}], "successUrl": "/goodpath", "failureUrl": "/badpath", "state": "somestatevariable"}
             headers = {
                 'Content-Type': "application/json"
             }
-            rLink = s.post(s.url + 'request_linkapp_url',
-                           auth=HTTPBasicAuth(appId, appSecret), data=json.dumps(payload), headers=headers).json()
-            linkUrl = rLink['request_linkapp_url']
-            sg.Popup(
-                'Please click OK to follow the below URL and link this app with the desired Org:', linkUrl)
-            webbrowser.open_new(linkUrl)
-            sg.Popup(
-                'Click OK once you have linked your Org to continue')
-
-def getTemplates():
-    '''Updates existing templates list.'''
-    response = s.get(s.url+'orgs/'+orgId+'/merittemplates?limit=100')
-    templates = response.json()['merittemplates']
-    nextPage = response.json()['paging']['pageInfo']['hasNextPage']
+            rLink = session.post(session.url + 'request_linkapp_url',
+                           auth=HTTPBasicAuth(appId, appSecret), data=json.dumps(payload), headers=headers)
+            rLink.raise_for_status()
+            reporter.linkApp(rLink.json()['request_linkapp_url'])
+
+def templatePages(org, startingAfter=None):
+    '''Template pages
+    Walks the cursor pagination of the Org's merittemplates, yielding (templates, afterCursor) for each page of up to 100.
+    Passing the last `afterCursor` seen as `startingAfter` only returns templates added after that page.
+    '''
+    url = org.session.url+'orgs/'+org.orgId+'/merittemplates?limit=100'
+    nextPage = True
     while nextPage:
-        cursor = response.json()['paging']['cursors']['after']
-        response = s.get(s.url+'orgs/'+orgId+'/merittemplates?limit=100&starting_after='+cursor)
-        newTemplates = response.json()['merittemplates']
-        templates.extend(newTemplates)
-        nextPage = response.json()['paging']['pageInfo']['hasNextPage']
-    return templates
-
-def getFields():
+        response = org.session.get(url + ('&starting_after=' + startingAfter if startingAfter else '')).json()
+        startingAfter = response['paging']['cursors'].get('after') or startingAfter
+        nextPage = response['paging']['pageInfo']['hasNextPage']
+        yield response['merittemplates'], startingAfter
+
+def getTemplates(org, startingAfter=None):
+    '''Updates existing templates list. Returns (templates, afterCursor), see `templatePages`.'''
+    templates = []
+    for page, startingAfter in templatePages(org, startingAfter):
+        templates.extend(page)
+    return templates, startingAfter
+
+def getFields(org):
     '''Update existing fields list.'''
-    response = s.get(s.url+'orgs/'+orgId+'/fields')
+    response = org.session.get(org.session.url+'orgs/'+org.orgId+'/fields')
     fields = response.json()['fields']
     return fields
 
+def defaultCacheDir():
+    '''Per-user cache directory for Org snapshots.'''
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'templates_creator')
+
+class orgSnapshot:
+    '''Org snapshot cache
+    JSON copy on disk of an Org's templates and fields, so repeat runs within `ttl` seconds can skip the `getTemplates`/`getFields` warm-up.
+    '''
+    def __init__(self, cacheDir, server, orgId, ttl=3600, delta=False):
+        host = server.split('://')[-1].split('/')[0]
+        self.path = os.path.join(cacheDir, host + '-' + orgId + '.json')
+        self.ttl = ttl
+        self.delta = delta
+        self.cursor = None
+        self.fetchedAt = None
+
+    def load(self, org):
+        '''Returns (templates, fields) for the Org, from disk and/or the API as described above.'''
+        snapshot = self.read()
+        if snapshot is None or time.time() - snapshot['fetchedAt'] > self.ttl:
+            templates, self.cursor = getTemplates(org)
+            self.fetchedAt = time.time()
+            return templates, getFields(org)
+        self.cursor = snapshot['cursor']
+        self.fetchedAt = snapshot['fetchedAt']
+        if not self.delta and not os.path.exists(self.path + '.unfinished'):
+            return snapshot['templates'], snapshot['fields']
+        newTemplates, self.cursor = getTemplates(org, self.cursor)
+        templates = {template['id']: template for template in snapshot['templates']}
+        templates.update((template['id'], template) for template in newTemplates)
+        return list(templates.values()), getFields(org)
+
+    def read(self):
+        try:
+            with open(self.path) as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return None
+
+    def begin(self):
+        '''Marks the snapshot as possibly behind the Org, because a run is about to write to it.'''
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        open(self.path + '.unfinished', 'w').close()
+
+    def save(self, templates, fields):
+        '''Writes the snapshot atomically, including anything created during the run, and clears the `begin` mark.'''
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        snapshot = {'fetchedAt': self.fetchedAt, 'cursor': self.cursor, 'templates': templates, 'fields': fields}
+        with open(self.path + '.tmp', 'w') as outfile:
+            json.dump(snapshot, outfile)
+        os.replace(self.path + '.tmp', self.path)
+        self.remove(self.path + '.unfinished')
+
+    def invalidate(self):
+        '''Deletes the snapshot so the next `load` does a full fetch.'''
+        self.remove(self.path)
+        self.remove(self.path + '.unfinished')
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class runJournal:
+    '''Checkpoint journal
+    Append-only JSON lines record of each completed `createField`, `createTemplate` and `addFieldSetting` call, loaded with `resume` so that work is skipped.
+    '''
+    def __init__(self, path, server, orgId, resume=False, batchSize=100, interval=1.0):
+        self.path = path
+        self.batchSize = batchSize
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.lastFlush = time.monotonic()
+        self.fields = []
+        self.templates = []
+        self.settings = set()
+        checkJournal(path, server, orgId, resume)
+        if resume and os.path.exists(path):
+            self.load()
+            self.outfile = open(path, 'a')
+        else:
+            self.outfile = open(path, 'w')
+            self.buffer.append(json.dumps({'op': 'start', 'server': server, 'orgId': orgId}))
+            self.flush()
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(target=self.flushEvery, daemon=True)
+        self.flusher.start()
+
+    def load(self):
+        with open(self.path) as infile:
+            for line in infile:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # torn final line from a crash mid-write
+                    continue
+                if entry['op'] == 'field':
+                    self.fields.append(entry['data'])
+                if entry['op'] == 'template':
+                    self.templates.append(entry['data'])
+                if entry['op'] == 'setting':
+                    self.settings.add((entry['data']['templateId'], entry['data']['fieldId']))
+
+    def record(self, op, data):
+        '''Appends a completed operation; flushes when the batch is full or `interval` has passed.'''
+        with self.lock:
+            self.buffer.append(json.dumps({'op': op, 'data': data}))
+            if op == 'setting':
+                self.settings.add((data['templateId'], data['fieldId']))
+            if len(self.buffer) >= self.batchSize or time.monotonic() - self.lastFlush >= self.interval:
+                self.flushLocked()
+
+    def settingDone(self, templateId, fieldId):
+        return (templateId, fieldId) in self.settings
+
+    def flush(self):
+        with self.lock:
+            self.flushLocked()
+
+    def flushEvery(self):
+        while not self.closed.wait(self.interval):
+            self.flush()
+
+    def flushLocked(self):
+        if self.buffer:
+            self.outfile.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+            self.outfile.flush()
+            os.fsync(self.outfile.fileno())
+        self.lastFlush = time.monotonic()
+
+    def close(self, finished=False):
+        '''Stops the background flusher and writes what is left; `finished` marks the run as complete, so the journal can be started afresh next time.'''
+        self.closed.set()
+        self.flusher.join()
+        with self.lock:
+            if finished:
+                self.buffer.append(json.dumps({'op': 'finish'}))
+            self.flushLocked()
+            self.outfile.close()
+
+
+def checkJournal(path, server, orgId, resume=False):
+    '''Raises ValueError if the journal at `path` cannot be used: with `resume`, it belongs to another Org; without, its run did not finish.'''
+    if not os.path.exists(path):
+        return
+    if not resume:
+        if not journalFinished(path):
+            raise ValueError('Journal ' + path + ' is from a run that did not finish; re-run with --resume to pick it up, '
+                             'or delete the journal to start again from scratch.')
+        return
+    with open(path) as infile:
+        try:
+            start = json.loads(infile.readline())
+        except ValueError:
+            return
+    if (start.get('server'), start.get('orgId')) != (server, orgId):
+        raise ValueError('Journal ' + path + ' belongs to Org ' + str(start.get('orgId')) + ' on ' + str(start.get('server')) +
+                         '; it cannot be resumed here.')
+
+def journalFinished(path):
+    '''Whether the journal's last entry is the `finish` entry of a completed run; only the tail of the file is read.'''
+    with open(path, 'rb') as infile:
+        infile.seek(max(os.path.getsize(path) - 4096, 0))
+        lines = infile.read().splitlines()
+    try:
+        return bool(lines) and json.loads(lines[-1])['op'] == 'finish'
+    except (ValueError, KeyError, TypeError):
+        return False
+
 def userInput():
     '''User input
     text input for orgId, appId, and appSecret
     file upload prompt to select .csv
     '''
+    loadGui()
     layout = [
         [sg.Text('Please enter your orgId, appId, and appSecret and select your CSV')],
         [sg.Text('orgId', size=(15, 1)), sg.InputText(key='orgId')],
@@ -192,171 +601,1068 @@ def userInput():
         [sg.Text('File')], [sg.Input(), sg.FileBrowse()],
         [sg.Combo(('Staging', 'Sandbox', 'Production'),
                   key='Environment', size=(10, 1), default_value='Sandbox')],
+        [sg.Text('Workers', size=(15, 1)), sg.InputText('8', key='workers')],
         [sg.Submit(), sg.Cancel()]
     ]
     window = sg.Window(
         'Basic Authentication and file selection', layout, finalize=True)
     while True:
         event, values = window.Read(timeout=100)
-        if values['Environment'] == 'Staging':
-            values['Environment'] = 'https://qwebhjklr-api.merits.com/v2/'
-        if values['Environment'] == 'Sandbox':
-            values['Environment'] = 'https://sandbox-api.merits.com/v2/'
-        if values['Environment'] == 'Production':
-            values['Environment'] = 'https://api.merits.com/v2/'
-        if event is (None, 'Cancel'):
+        # closing the window reads as a None event, with None for values
+        if event in (None, 'Cancel'):
             window.Close()
-            break
+            return None
         if event == 'Submit':
+            values['Environment'] = environments.get(values['Environment'], values['Environment'])
             window.Close()
             return values.values()
-    window.Close()
 
-def templatesFileValidation(templatesCSV):
+def readHeader(templatesCSV):
+    '''Returns the header row of a CSV input.'''
+    with open(templatesCSV, newline='') as infile:
+        return next(csv.reader(infile), [])
+
+def isJsonLines(path):
+    '''JSON Lines input is recognised by its extension; anything else is read as CSV.'''
+    return path.lower().endswith(jsonLinesExtensions)
+
+def layoutHeader(groups):
+    '''The CSV header for `groups` field groups.'''
+    return templateColumns + fieldColumns * groups
+
+def headerLayout(header):
+    '''Returns 'long' for a header with a single field group, 'wide' for two or more, or None if the header follows neither.'''
+    groups, extra = divmod(len(header) - len(templateColumns), len(fieldColumns))
+    if groups < 1 or extra or header != layoutHeader(groups):
+        return None
+    return 'long' if groups == 1 else 'wide'
+
+def inputLayout(path):
+    '''Returns 'jsonl', 'long', 'wide', or None for a CSV whose header is not recognised.'''
+    return 'jsonl' if isJsonLines(path) else headerLayout(readHeader(path))
+
+def countTemplateRows(templatesCSV):
+    '''Cheap line count of the input, minus any header, used only to size progress meters.'''
+    with open(templatesCSV, 'rb') as infile:
+        return max(sum(1 for _ in infile) - (0 if isJsonLines(templatesCSV) else 1), 0)
+
+def headerError():
+    '''Message shown when the header row does not match a recognised layout.'''
+    return 'An error has been found with your header row. Please ensure it follows the below format exactly: the template columns, then the field ' + \
+        'columns repeated once for each field (any number of times; ' + str(maxFields) + ' in the template CSV). With the field columns only once, ' + \
+        'each row is one template and field, and consecutive rows with the same title make up one template:\n' + ', '.join(layoutHeader(1)) + ', ...'
+
+def maxLength(limit):
+    return lambda cell: len(cell) <= limit
+
+def oneOf(values):
+    return lambda cell: cell in values
+
+def blankOrLength(length):
+    return lambda cell: cell == '' or len(cell) == length
+
+trueFalse = frozenset(['TRUE', 'FALSE'])
+columnRules = {
+    # column: [(rule, test, message)], checked in order; only the first rule a cell breaks is reported
+    'meritTemplate.title': [('required', bool, 'this cell cannot be blank'),
+                            ('maxLength', maxLength(60), 'Template Title is too long')],
+    'meritTemplate.description': [('required', bool, 'this cell cannot be blank'),
+                                  ('maxLength', maxLength(160), 'Template Description is too long')],
+    'meritTemplate.canOnlyBeSentOnce': [('required', bool, 'this cell cannot be blank'),
+                                        ('trueFalse', oneOf(trueFalse), 'value must be exactly TRUE or FALSE')],
+    'meritTemplate.coverPhotoId': [('idLength', blankOrLength(24), 'template IDs are expected to be 24 characters in length')],
+    'meritTemplate.coverPhotoFileName': [('maxLength', maxLength(160), 'please use a smaller fileName (less than 155 characters)')],
+    'field.name': [('maxLength', maxLength(35), 'Field Name is too long')],
+    'field.fieldType': [('required', bool, 'this cell cannot be blank'),
+                        ('fieldType', oneOf(frozenset(fieldTypes)), 'Field Type must be exactly one of the following: ' +
+                         ', '.join(fieldTypes[:-1]) + ', or ' + fieldTypes[-1])],
+    'field.description': [('required', bool, 'this cell cannot be blank'),
+                          ('maxLength', maxLength(160), 'Field Description is too long')],
+    'field.newEnabled': [('required', bool, 'this cell cannot be blank'),
+                         ('trueFalse', oneOf(trueFalse), 'value must be exactly TRUE or FALSE')],
+    'field.newRequired': [('required', bool, 'this cell cannot be blank'),
+                          ('trueFalse', oneOf(trueFalse), 'value must be exactly TRUE or FALSE')],
+    'field.newValueForAllMerits': []
+}
+
+class rowValidator:
+    '''Compiled row validation
+    The header is compiled once into a rule table: the rules for each template column, and for each field group the column of its field.name plus the rules for each of its cells.
+    A field group whose cells are all blank is an unused slot and is skipped whole, so a mostly empty sheet costs one comparison and a slice per unused group;
+    a group with a blank field.name but other cells filled in is an error rather than a field dropped without notice.
+    '''
+    def __init__(self, header):
+        self.header = header
+        self.templateCells = []
+        self.fieldGroups = []
+        for col, column in enumerate(header):
+            cell = (col, column, columnRules.get(column, []))
+            if column == 'field.name':
+                self.fieldGroups.append((col, [cell]))
+            elif column.startswith('field.') and self.fieldGroups:
+                self.fieldGroups[-1][1].append(cell)
+            else:
+                self.templateCells.append(cell)
+
+    def errors(self, num, row):
+        '''Returns a list of every rule broken by data row `num`, as error dicts with the row, 1-based column, column name, rule and message; empty if the row is valid.'''
+        if len(row) != len(self.header):
+            return [validationError(num, None, None, 'columnCount', 'this row has ' + str(len(row)) +
+                                    ' columns but the header row has ' + str(len(self.header)))]
+        errors = []
+        self.checkCells(num, row, self.templateCells, errors)
+        for nameCol, cells in self.fieldGroups:
+            if row[nameCol] != '':
+                self.checkCells(num, row, cells, errors)
+            elif any(row[nameCol + 1:cells[-1][0] + 1]):
+                errors.append(self.cellError(num, nameCol, 'field.name', 'required', 'this cell cannot be blank'))
+        return errors
+
+    def checkCells(self, num, row, cells, errors):
+        for col, column, rules in cells:
+            cell = row[col]
+            for rule, test, message in rules:
+                if not test(cell):
+                    errors.append(self.cellError(num, col, column, rule, message))
+                    break
+
+    def cellError(self, num, col, column, rule, message):
+        return validationError(num, col + 1, column, rule, message)
+
+class recordValidator(rowValidator):
+    '''Validation of JSON Lines records flattened by `recordRow`; errors name the line and the record key (`fields[2].fieldType`) instead of a column.'''
+    def cellError(self, num, col, column, rule, message):
+        if col < len(templateKeys):
+            key = templateKeys[col]
+        else:
+            group, offset = divmod(col - len(templateKeys), len(fieldKeys))
+            key = 'fields[' + str(group) + '].' + fieldKeys[offset]
+        return validationError(num, None, key, rule, message, ' Line: ' + str(num) + ' Key: ' + key, 'file')
+
+def validationError(num, col, column, rule, message, location=None, source='CSV'):
+    '''One validation error; `message` keeps the wording and Row/Col location the popups have always shown.'''
+    location = location or ' Row: ' + str(num) + (' Col: ' + str(col) if col else '')
+    return {'row': num, 'col': col, 'column': column, 'rule': rule,
+            'message': 'Error, ' + message + '. Please correct your ' + source + ' and retry.' + location}
+
+def jsonCell(value):
+    '''A JSON value as the equivalent CSV cell.'''
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    return str(value)
+
+def recordRow(num, line):
+    '''Flattens one JSON Lines template record into a row in the CSV column layout, with one field group per field.
+    Returns (row, None), or (None, error) if the line is not a template record: not JSON, a key the record format does not have, or a field without a `name`.
+    '''
+    try:
+        record = json.loads(line)
+    except ValueError as error:
+        return None, validationError(num, None, None, 'json', 'this line is not valid JSON (' + str(error) + ')', ' Line: ' + str(num), 'file')
+    fields = (record.get('fields') or []) if isinstance(record, dict) else None
+    if not isinstance(fields, list) or not all(isinstance(field, dict) for field in fields):
+        return None, validationError(num, None, None, 'json', 'each line must be a template object, with "fields" a list of field objects',
+                                     ' Line: ' + str(num), 'file')
+    unknown = sorted(set(record) - set(templateKeys) - {'fields'})
+    unknown += ['fields[' + str(group) + '].' + key for group, field in enumerate(fields) for key in sorted(set(field) - set(fieldKeys))]
+    if unknown:
+        return None, validationError(num, None, unknown[0], 'json', 'unknown key ' + ', '.join(unknown) + ' (expected ' + ', '.join(templateKeys) +
+                                     ', fields; and for each field ' + ', '.join(fieldKeys) + ')', ' Line: ' + str(num), 'file')
+    for group, field in enumerate(fields):
+        if 'name' not in field:
+            return None, validationError(num, None, 'fields[' + str(group) + '].name', 'json', 'each field must have a name',
+                                         ' Line: ' + str(num) + ' Key: fields[' + str(group) + '].name', 'file')
+    row = [jsonCell(record.get(key)) for key in templateKeys]
+    for field in fields:
+        row.extend(jsonCell(field.get(key)) for key in fieldKeys)
+    return row, None
+
+def csvInputRows(header, num, lines):
+    '''Yields (rowNumber, errors, row) for the CSV data rows in `lines`, the first of which is row `num`.'''
+    validator = rowValidator(header)
+    for num, row in enumerate(csv.reader(lines), num):
+        yield num, validator.errors(num, row), row
+
+def jsonInputRows(num, lines):
+    '''Yields (lineNumber, errors, row) for the JSON Lines records in `lines`, the first of which is line `num`; blank lines are skipped.'''
+    validators = {}
+    for num, line in enumerate(lines, num):
+        if not line.strip():
+            continue
+        row, error = recordRow(num, line)
+        if error:
+            yield num, [error], None
+            continue
+        groups = (len(row) - len(templateKeys)) // len(fieldKeys)
+        if groups not in validators:
+            validators[groups] = recordValidator(layoutHeader(groups))
+        yield num, validators[groups].errors(num, row), row
+
+def inputRows(path):
+    '''Input reader
+    Yields (rowNumber, errors, row) for every data row of a CSV, in the wide or long layout, or of a JSON Lines file, one at a time and already checked against the column rules.
+    Every row comes back in the CSV column layout, with only as many field groups as its header (or, for JSON Lines, its record) has.
+    A CSV header that follows neither layout is yielded as row 1 with a `header` error, and nothing is read after it.
+    '''
+    if isJsonLines(path):
+        with open(path) as infile:
+            yield from jsonInputRows(1, infile)
+        return
+    with open(path, newline='') as infile:
+        header = next(csv.reader(infile), [])
+        if headerLayout(header) is None:
+            yield 1, [dict(validationError(1, None, None, 'header', ''), message=headerError())], None
+            return
+        yield from csvInputRows(header, 2, infile)
+
+def inputTemplates(path):
+    '''Template reader
+    Yields (firstRow, lastRow, errors, template) for each template in the input, in file order; `template` is None for a row with errors.
+    Each row of a wide CSV or JSON Lines file is one template. In the long layout, consecutive rows with the same title are one template:
+    the template columns are taken from the first of them, and each row adds its field.
+    '''
+    grouped = inputLayout(path) == 'long'
+    current = None
+    for num, errors, row in inputRows(path):
+        if errors:
+            if current:
+                yield current
+                current = None
+            yield num, num, errors, None
+            continue
+        template = templateFromRow(row)
+        if grouped and current and normaliseName(template.title) == normaliseName(current[3].title):
+            current[3].additionalFields.extend(template.additionalFields)
+            current = (current[0], num, [], current[3])
+            continue
+        if current:
+            yield current
+        current = (num, num, [], template)
+    if current:
+        yield current
+
+def inputChunks(path, chunkSize, jsonLines=False):
+    '''Splits the data rows of the input into (firstRowNumber, text) chunks of `chunkSize` rows without parsing them.
+    A JSON Lines record is one line. A CSV record ends at a line break with an even number of quotes before it, so quoted cells that contain line breaks are never split.
+    '''
+    with open(path, newline='') as infile:
+        num = 1
+        if not jsonLines:
+            infile.readline()
+            num = 2
+        lines = []
+        rows = 0
+        quotes = 0
+        for line in infile:
+            lines.append(line)
+            if not jsonLines:
+                quotes += line.count('"')
+            if quotes % 2 == 0:
+                rows += 1
+                if rows == chunkSize:
+                    yield num, ''.join(lines)
+                    num += rows
+                    lines = []
+                    rows = 0
+        if lines:
+            yield num, ''.join(lines)
+
+def validateChunk(header, num, text):
+    '''Parses and validates one chunk from `inputChunks`; runs in a worker process. `header` is None for JSON Lines. Returns (rows parsed, errors).'''
+    lines = io.StringIO(text, newline='')
+    errors = []
+    rows = 0
+    for rows, (num, rowErrors, row) in enumerate(jsonInputRows(num, lines) if header is None else csvInputRows(header, num, lines), 1):
+        errors.extend(rowErrors)
+    return rows, errors
+
+def validatedChunks(header, chunks, processes):
+    '''Yields `validateChunk` results in file order, from up to `processes` worker processes with at most `processes * 2` chunks in flight.'''
+    if processes == 1:
+        for num, text in chunks:
+            yield validateChunk(header, num, text)
+        return
+    inFlight = deque()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for num, text in chunks:
+            inFlight.append(pool.submit(validateChunk, header, num, text))
+            while len(inFlight) >= processes * 2:
+                yield inFlight.popleft().result()
+        while inFlight:
+            yield inFlight.popleft().result()
+
+def validateFile(templatesCSV, processes=None, chunkSize=2000):
+    '''Whole file validation
+    Checks every row of a CSV or JSON Lines input without making any API calls and returns (number of data rows, every error in row order).
+    Chunks of `chunkSize` rows are parsed and validated on up to `processes` worker processes (default: one per core); a sheet of a single chunk is checked in this process.
+    '''
+    header = None
+    if not isJsonLines(templatesCSV):
+        header = readHeader(templatesCSV)
+        if headerLayout(header) is None:
+            return 0, [dict(validationError(1, None, None, 'header', ''), message=headerError())]
+    chunks = inputChunks(templatesCSV, chunkSize, header is None)
+    first = list(itertools.islice(chunks, 2))
+    if len(first) < 2:
+        processes = 1
+    total = 0
+    errors = []
+    for rows, chunkErrors in validatedChunks(header, itertools.chain(first, chunks), processes or os.cpu_count() or 1):
+        total += rows
+        errors.extend(chunkErrors)
+    return total, errors
+
+def templatesFileValidation(templatesCSV, reporter, processes=None, reportPath=None):
     '''File validation
-    Read a CSV file to ensure the formatting is as required for ingestion.
+    Checks the whole CSV with `validateFile`, without making any API calls, and hands every error to `reporter.validation` rather than stopping at the first one.
+    `templatesPipeline` applies the same rules as it streams, so this is only needed to check a sheet ahead of a run. Writes the errors as JSON to `reportPath`, when given.
+    Returns True if the sheet is valid.
     '''
-    headerRow = ['meritTemplate.title', 'meritTemplate.description', 'meritTemplate.canOnlyBeSentOnce', 'meritTemplate.coverPhotoId', 'meritTemplate.coverPhotoFileName', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired',
-                 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits', 'field.name', 'field.fieldType', 'field.description', 'field.newEnabled', 'field.newRequired', 'field.newValueForAllMerits']
-    sg.Popup('Click OK to begin CSV validation.',
-             'Note, this may take a few minutes. You will be notified if errors are found or if validation passes successfully.')
-    with open(templatesCSV) as infile:
-        sheet = list(csv.reader(infile))
-        for num, row in enumerate(sheet):
-            for col, cell in enumerate(row):
-                if num == 0:
-                    if cell != headerRow[col]:
-                        sg.PopupScrolled('An error has been found with your header row. Please ensure it follows the below format exactly, even if all 35 fields are not utilized in your templates:', 'meritTemplate.title, meritTemplate.description , meritTemplate.canOnlyBeSentOnce, meritTemplate.coverPhotoId, meritTemplate.coverPhotoFileName, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits')
-                        return False
-                elif sheet[0][col] not in ['field.newValueForAllMerits', 'meritTemplate.coverPhotoId', 'meritTemplate.coverPhotoFileName'] and cell == '':
-                    breakMessage = 'Error, this cell cannot be blank. Please correct your CSV and retry. Row: ' + \
-                        str(num + 1) + ' Col: ' + str(col + 1)
-                    sg.PopupError(breakMessage)
-                    return False
-                else:
-                    if sheet[0][col] == 'meritTemplate.title' and len(cell) > 60:
-                        breakMessage = 'Error, Template Title is too long. Please correct your CSV and retry. Row: ' + \
-                            str(num + 1) + ' Col: ' + str(col + 1)
-                        sg.PopupError(breakMessage)
-                        return False
-                    if sheet[0][col] == 'meritTemplate.description' and len(cell) > 160:
-                        breakMessage = 'Error, Template Description is too long. Please correct your CSV and retry. Row: ' + \
-                            str(num + 1) + ' Col: ' + str(col + 1)
-                        sg.PopupError(breakMessage)
-                        return False
-                    if sheet[0][col] == 'meritTemplate.canOnlyBeSentOnce' and cell not in ['TRUE', 'FALSE']:
-                        breakMessage = 'Error, value must be exactly TRUE or FALSE. Please correct your CSV and retry. Row: ' + \
-                            str(num + 1) + ' Col: ' + str(col + 1)
-                        sg.PopupError(breakMessage)
-                        return False
-                    if sheet[0][col] == 'meritTemplate.coverPhotoId' and cell != '':
-                        if len(cell) != 24:
-                            breakMessage = 'Error, template IDs are expected to be 24 characters in length. Please correct your CSV and retry. Row: ' + \
-                                str(num + 1) + ' Col: ' + str(col + 1)
-                            sg.PopupError(breakMessage)
-                            return False
-                    if sheet[0][col] == 'meritTemplate.coverPhotoFileName' and len(cell) > 160:
-                        breakMessage = 'Error, please use a smaller fileName (less than 155 characters). Please correct your CSV and retry. Row: ' + str(
-                            num + 1) + ' Col: ' + str(col + 1)
-                        sg.PopupError(breakMessage)
-                        return False
-                    if sheet[0][col] == 'field.name' and len(cell) > 35:
-                        breakMessage = 'Error, Field Name is too long. Please correct your CSV and retry. Row: ' + \
-                            str(num + 1) + ' Col: ' + str(col + 1)
-                        sg.PopupError(breakMessage)
-                        return False
-                    if sheet[0][col] == 'field.fieldType' and cell not in['ShortText', 'LongText', 'Date', 'Checkbox', 'Documents', 'Photos', 'Videos', 'Name']:
-                        breakMessage = 'Error, Field Type must be exactly one of the following: ShortText, LongText, Date, Checkbox, Documents, Photos, Videos, or Name. Please correct your CSV and retry. Row: ' + \
-                            str(num + 1) + ' Col: ' + str(col + 1)
-                        sg.PopupError(breakMessage)
-                        return False
-                    if sheet[0][col] == 'field.description' and len(cell) > 160:
-                        breakMessage = 'Error, Field Description is too long. Please correct your CSV and retry. Row: ' + \
-                            str(num + 1) + ' Col: ' + str(col + 1)
-                        sg.PopupError(breakMessage)
-                        return False
-                    if sheet[0][col] == 'field.newEnabled' and cell not in ['TRUE', 'FALSE']:
-                        breakMessage = 'Error, value must be exactly TRUE or FALSE. Please correct your CSV and retry. Row: ' + \
-                            str(num + 1) + ' Col: ' + str(col + 1)
-                        sg.PopupError(breakMessage)
-                        return False
-                    if sheet[0][col] == 'field.newRequired' and cell not in ['TRUE', 'FALSE']:
-                        breakMessage = 'Error, value must be exactly TRUE or FALSE. Please correct your CSV and retry. Row: ' + \
-                            str(num + 1) + ' Col: ' + str(col + 1)
-                        sg.PopupError(breakMessage)
-                        return False
-    sg.Popup('CSV Successfully Validated. Press OK to continue.')
-    return True
-
-def templatesFileIngestion(templatesCSV):
-    '''File ingestion
-    Read a properly formatted CSV into the template and field classes, ending in a structured dict.
-    Columns 0-2 are for the template itself, and every set of 6 columns after that repeat for each additional field to be added (max 35 additional fields). 
-    Formatted CSV Header Row:
-    meritTemplate.title,meritTemplate.description,meritTemplate.canOnlyBeSentOnce, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits, field.name, field.fieldType, field.description, field.newEnabled, field.newRequired, field.newValueForAllMerits
+    rows, errors = validateFile(templatesCSV, processes)
+    if reportPath:
+        with open(reportPath, 'w') as outfile:
+            json.dump({'file': templatesCSV, 'rows': rows, 'valid': not errors, 'errors': errors}, outfile, indent=2)
+    reporter.validation(rows, errors)
+    return not errors
+
+def templateFromRow(row):
+    '''Builds a newTemplate, with its newField instances, from one validated data row.
+    Columns 0-4 are for the template itself, and every set of 6 columns after that repeat for each additional field to be added; a group with a blank field.name is unused.
+    '''
+    thisTemplateFields = []
+    for cell in range(len(templateColumns), len(row), len(fieldColumns)):
+        if row[cell] != '':
+            thisTemplateFields.append(newField(
+                '', row[cell], row[cell+1], row[cell+2], row[cell+3], row[cell+4], row[cell+5]))
+    return newTemplate('', row[0], row[1], row[2], row[3], row[4], thisTemplateFields)
+
+def templateChanges(template, meritTemplate):
+    '''Returns the description/canOnlyBeSentOnce values of `template` that differ from the existing `meritTemplate`; keys the Org copy lacks are not compared.'''
+    changes = {}
+    for key, value in [('description', template.description), ('canOnlyBeSentOnce', template.canOnlyBeSentOnce)]:
+        if key in meritTemplate and meritTemplate[key] != value:
+            changes[key] = value
+    return changes
+
+def planTemplate(org, template):
+    '''Change plan
+    Compares one row's desired template and field settings with the Org's current state and returns the operations needed, in the order they have to run:
+    createField, createTemplate or updateTemplate, then setField for each field setting that is missing or differs.
+    Nothing is written; the only API call is reading the current field settings of a template that already exists.
+    Resolves the ids of fields and templates that already exist onto `template` as a side effect.
     '''
-    tList = []
-    index = 0
-    templatesCount = 0
-    with open(templatesCSV) as infile:
-        sheet = list(csv.reader(infile))
-        templatesCount = len(sheet)-1
-        for row in sheet:
-            sg.OneLineProgressMeter('Template and Field Creation Progress', index,
-                                    templatesCount, 'key', 'Total templates to be processed:')
-            index += 1
-            if row[0] != 'meritTemplate.title':
-                thisTemplateFields = []
-                for cell in range(len(row)):
-                    if (row[cell] is not '' or None) and (sheet[0][cell] == 'field.name'):
-                        myField = newField(
-                            '', row[cell], row[cell+1], row[cell+2], row[cell+3], row[cell+4], row[cell+5])
-                        thisTemplateFields.append(myField.toDict())
-                myTemplate = newTemplate(
-                    '', row[0], row[1], row[2], row[3], row[4], thisTemplateFields)
-                tList.append(myTemplate.toDict())
-    return tList
-
-def addFieldSettings(template):
+    plan = []
+    for field in template.additionalFields:
+        existing = org.fieldIndex.get(field.fieldName)
+        if existing:
+            field.fieldId = existing['id']
+            field.fieldType = existing['fieldType']
+            field.description = existing['description']
+        else:
+            plan.append({'action': 'createField', 'fieldName': field.fieldName, 'fieldType': field.fieldType})
+    meritTemplate = org.templateIndex.get(template.title)
+    currentSettings = {}
+    if meritTemplate:
+        template.templateId = meritTemplate['id']
+        changes = templateChanges(template, meritTemplate)
+        if changes:
+            plan.append({'action': 'updateTemplate', 'title': template.title, 'changes': changes})
+        currentSettings = getTemplateFieldSettings(org, template.templateId)
+    else:
+        plan.append({'action': 'createTemplate', 'title': template.title})
+    for field in template.additionalFields:
+        current = currentSettings.get(field.fieldId, {})
+        changes = {key: value for key, value in fieldSettingPayload(field.toDict()).items()
+                   if key != 'fieldId' and current.get(key) != value}
+        if changes:
+            plan.append({'action': 'setField', 'title': template.title, 'fieldName': field.fieldName, 'changes': changes})
+    return plan
+
+def applyPlan(org, template, plan):
+    '''Carries out a plan from `planTemplate`: missing fields, then the template, then only the field settings the plan lists.'''
+    for field in template.additionalFields:
+        if not field.fieldId:
+            field.fieldExists(org)
+    template.meritTemplateExists(org)
+    changedFields = set()
+    for op in plan:
+        if op['action'] == 'updateTemplate':
+            updateTemplate(org, template.templateId, template.title, op['changes'])
+        if op['action'] == 'setField':
+            changedFields.add(op['fieldName'])
+    changed = [field.toDict() for field in template.additionalFields if field.fieldName in changedFields]
+    addFieldSettings(org, dict(template.toDict(), additionalFields=changed))
+
+def processTemplate(org, template, dryRun=False):
+    '''Template processing
+    Plans the row against the Org's current state and, unless `dryRun`, applies the plan. Everything one row depends on is done in order by a single worker.
+    Failing API calls are returned as a `failed` message rather than raised, so one bad row does not stop the run.
+    '''
+    try:
+        with org.session.metrics.span('plan'):
+            plan = planTemplate(org, template)
+        if not dryRun:
+            with org.session.metrics.span('apply', {'title': template.title}):
+                applyPlan(org, template, plan)
+    except requests.RequestException as error:
+        return {'title': template.title, 'id': template.templateId, 'fields': len(template.additionalFields), 'plan': [], 'failed': str(error)}
+    return {'title': template.title, 'id': template.templateId, 'fields': len(template.additionalFields), 'plan': plan}
+
+def templatesPipeline(org, templatesCSV, workers=1, dryRun=False):
+    '''Streaming pipeline
+    Parses each template from the input (see `inputTemplates`) once, validates it and hands it straight to the worker pool, so API work overlaps with parsing.
+    Yields one result dict per template, in file order: the `processTemplate` result plus its `row` and `lastRow` numbers, or `row` and `error` for an invalid row.
+    At most `workers * 2` templates are in flight at a time, so memory stays flat however large the sheet is.
+    The first validation error stops any further rows being submitted; rows already submitted are still completed and yielded before the error.
+    '''
+    inFlight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for num, lastRow, errors, template in inputTemplates(templatesCSV):
+            if errors:
+                while inFlight:
+                    yield finishRow(*inFlight.popleft())
+                yield {'row': num, 'error': errors[0]['message']}
+                return
+            inFlight.append((num, lastRow, pool.submit(processTemplate, org, template, dryRun)))
+            while len(inFlight) >= workers * 2:
+                yield finishRow(*inFlight.popleft())
+        while inFlight:
+            yield finishRow(*inFlight.popleft())
+
+def finishRow(num, lastRow, future):
+    '''Waits for a template submitted by `templatesPipeline` and tags its result with its first and last row numbers.'''
+    result = future.result()
+    result['row'] = num
+    result['lastRow'] = lastRow
+    return result
+
+def fieldSettingPayload(field):
+    '''Field setting body for an additionalField dict; newValueForAllMerits is only sent when the sheet sets one.'''
+    payload = {
+        'newEnabled': field['newEnabled'],
+        'newRequired': field['newRequired']
+    }
+    if field['newValueForAllMerits'] != '':
+        payload.update(
+            {'fieldId': field['id'], 'newValueForAllMerits': field['newValueForAllMerits']})
+    return payload
+
+def getTemplateFieldSettings(org, templateId):
+    '''Current field settings of an existing template, keyed by fieldId, read from the template's `enabledFieldSettings`.'''
+    response = org.session.get(org.session.url + 'merittemplates/' + templateId).json()
+    return {setting['fieldId']: setting for setting in response.get('enabledFieldSettings', [])}
+
+def updateTemplate(org, templateId, title, changes):
+    '''Updates the description and/or canOnlyBeSentOnce of an existing template, and the indexed copy to match.'''
+    headers = {
+        'Content-Type': "application/json"
+    }
+    org.session.patch(org.session.url + 'merittemplates/' + templateId, data=json.dumps(changes), headers=headers)
+    org.templateIndex.get(title).update(changes)
+
+def addFieldSetting(org, templateId, field):
+    '''Adds a single additionalField as a field setting on the meritTemplate, unless the journal shows it was already added.'''
+    if org.journal and org.journal.settingDone(templateId, field['id']):
+        return
+    url = org.session.url + "merittemplates/" + templateId + '/fields/' + field['id']
+    headers = {
+        'Content-Type': "application/json"
+    }
+    org.session.post(url, data=json.dumps(fieldSettingPayload(field)), headers=headers)
+    if org.journal:
+        org.journal.record('setting', {'templateId': templateId, 'fieldId': field['id']})
+    return
+
+def addFieldSettings(org, template):
     '''Adds the additonalFields as fields on the meritTemplate'''
     for field in template['additionalFields']:
-        if field['fieldName'] is not '' or None:
-            url = s.url + "merittemplates/" + \
-                template['id'] + '/fields/' + field['id']
-            payload = {
-                'newEnabled': field['newEnabled'],
-                'newRequired': field['newRequired']
-            }
-            if field['newValueForAllMerits'] is not '' or None:
-                payload.update(
-                    {'fieldId': field['id'], 'newValueForAllMerits': field['newValueForAllMerits']})
-            headers = {
-                'Content-Type': "application/json"
-            }
-            s.post(url, data=json.dumps(payload), headers=headers)
+        if field['fieldName'] != '':
+            addFieldSetting(org, template['id'], field)
     return
 
+class runMetrics:
+    '''Run instrumentation
+    Collects, per API endpoint (path with ids replaced by {id}): call count, status codes, retries, bytes sent and received, and a latency histogram.
+    Also records the wall time of each pipeline stage (`span`) and the number of rows processed.
+    `report` returns all of it as a dict for a JSON run report; when `trace` is set, every call and span is also kept as a Chrome trace event
+    so `writeTrace` can produce a file for chrome://tracing or Perfetto.
+    '''
+    latencyBuckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+    idParents = ('orgs', 'merittemplates', 'fields')
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        self.endpoints = {}
+        self.stages = {}
+        self.events = []
+        self.rows = 0
+
+    def endpointName(self, method, url, server):
+        path = url[len(server):] if url.startswith(server) else url
+        parts = path.split('?')[0].strip('/').split('/')
+        for num in range(1, len(parts)):
+            if parts[num - 1] in self.idParents and parts[num] not in self.idParents + ('access',):
+                parts[num] = '{id}'
+        return method.upper() + ' ' + '/'.join(parts)
+
+    def recordRequest(self, endpoint, status, started, seconds, bytesSent=0, bytesReceived=0):
+        '''Records one HTTP attempt; `status` is the status code, or the exception name if none came back.'''
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {
+                    'count': 0, 'retries': 0, 'statuses': {}, 'seconds': 0.0, 'maxSeconds': 0.0,
+                    'bytesSent': 0, 'bytesReceived': 0, 'latencyHistogram': [0] * (len(self.latencyBuckets) + 1)
+                }
+            stats['count'] += 1
+            stats['statuses'][str(status)] = stats['statuses'].get(str(status), 0) + 1
+            stats['seconds'] += seconds
+            stats['maxSeconds'] = max(stats['maxSeconds'], seconds)
+            stats['bytesSent'] += bytesSent
+            stats['bytesReceived'] += bytesReceived
+            stats['latencyHistogram'][bisect.bisect_left(self.latencyBuckets, seconds)] += 1
+            if self.trace:
+                self.events.append(self.traceEvent(endpoint, 'api', started, seconds, {'status': status}))
+
+    def recordRetry(self, endpoint):
+        with self.lock:
+            if endpoint in self.endpoints:
+                self.endpoints[endpoint]['retries'] += 1
+
+    @contextlib.contextmanager
+    def span(self, name, args=None):
+        '''Times a pipeline stage; repeated stages (one per row, say) are summed under one name.'''
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            with self.lock:
+                stage = self.stages.setdefault(name, {'count': 0, 'seconds': 0.0})
+                stage['count'] += 1
+                stage['seconds'] += seconds
+                if self.trace:
+                    self.events.append(self.traceEvent(name, 'stage', started, seconds, args))
+
+    def traceEvent(self, name, category, started, seconds, args):
+        return {'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                'ts': round((started - self.origin) * 1e6), 'dur': round(seconds * 1e6), 'args': args or {}}
+
+    def report(self):
+        seconds = time.perf_counter() - self.origin
+        with self.lock:
+            endpoints = {}
+            for endpoint, stats in sorted(self.endpoints.items()):
+                endpoints[endpoint] = dict(stats, meanSeconds=round(stats['seconds'] / stats['count'], 6),
+                                           seconds=round(stats['seconds'], 6), maxSeconds=round(stats['maxSeconds'], 6))
+            return {
+                'startedAt': self.started,
+                'seconds': round(seconds, 3),
+                'rows': self.rows,
+                'rowsPerSecond': round(self.rows / seconds, 2) if seconds else None,
+                'requests': sum(stats['count'] for stats in self.endpoints.values()),
+                'retries': sum(stats['retries'] for stats in self.endpoints.values()),
+                'latencyBuckets': self.latencyBuckets + ['inf'],
+                'endpoints': endpoints,
+                'stages': {name: dict(stage, seconds=round(stage['seconds'], 6)) for name, stage in self.stages.items()}
+            }
+
+    def writeReport(self, path):
+        with open(path, 'w') as outfile:
+            json.dump(self.report(), outfile, indent=2)
+
+    def writeTrace(self, path):
+        with open(path, 'w') as outfile:
+            with self.lock:
+                json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, outfile)
+
+class rateLimiter:
+    '''Client-side rate limit
+    Spaces requests from all worker threads at least 1/`rate` seconds apart; a `rate` of None means no limit.
+    `pause` holds every worker back for a while, which is how a Retry-After from the API is applied to the whole run rather than to one thread.
+    '''
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.nextSlot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.nextSlot)
+            self.nextSlot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.nextSlot = max(self.nextSlot, time.monotonic() + seconds)
+
+class meritSession(requests.Session):
+    '''Merit API session
+    requests.Session that times out, retries, rate limits and re-authenticates every API call, and records each attempt in `metrics`.
+    '''
+    retryStatuses = (429, 500, 502, 503, 504)
+    # the server may have acted on a POST before failing with these
+    ambiguousStatuses = (500, 502, 504)
+
+    def __init__(self, server, workers, timeout=30, retries=5, backoff=0.5, maxBackoff=60, rateLimit=None, metrics=None, adapter=None, limiter=None):
+        requests.Session.__init__(self)
+        adapter = adapter or HTTPAdapter(pool_connections=1, pool_maxsize=max(workers, 10))
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.url = server
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.limiter = limiter or rateLimiter(rateLimit)
+        self.metrics = metrics or runMetrics()
+        self.credentials = None
+        self.authLock = threading.Lock()
+
+    def login(self, orgId, appId, appSecret, reporter):
+        '''Gets an orgAccessToken via `auth` and keeps the credentials so an expired token can be replaced mid-run.'''
+        self.credentials = (orgId, appId, appSecret, reporter)
+        self.headers.update(auth(self, orgId, appId, appSecret, reporter))
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        endpoint = self.metrics.endpointName(method, url, self.url)
+        attempt = 0
+        while True:
+            if attempt:
+                self.metrics.recordRetry(endpoint)
+            self.limiter.wait()
+            started = time.perf_counter()
+            try:
+                response = requests.Session.request(self, method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                self.metrics.recordRequest(endpoint, type(error).__name__, started, time.perf_counter() - started)
+                # a POST that timed out waiting for its response may have been applied; resending it could create a duplicate
+                if attempt >= self.retries or (method.upper() == 'POST' and isinstance(error, requests.ReadTimeout)):
+                    raise
+                attempt += 1
+                time.sleep(self.backoffDelay(attempt))
+                continue
+            body = response.request.body or b''
+            # bodies from json.dumps are str; count what goes on the wire
+            sent = len(body.encode('utf-8') if isinstance(body, str) else body)
+            self.metrics.recordRequest(endpoint, response.status_code, started, time.perf_counter() - started, sent, len(response.content))
+            login = 'auth' in kwargs
+            if response.status_code == 401 and self.credentials and not login:
+                self.refreshToken(response.request.headers.get('Authorization'))
+                if attempt >= self.retries:
+                    response.raise_for_status()
+                attempt += 1
+                continue
+            ambiguous = method.upper() == 'POST' and not login and response.status_code in self.ambiguousStatuses
+            if response.status_code in self.retryStatuses and attempt < self.retries and not ambiguous:
+                attempt += 1
+                delay = retryAfter(response)
+                if delay is None:
+                    delay = self.backoffDelay(attempt)
+                else:
+                    self.limiter.pause(delay)
+                time.sleep(delay)
+                continue
+            if login:
+                return response
+            response.raise_for_status()
+            return response
+
+    def backoffDelay(self, attempt):
+        '''Full jitter: a random delay up to backoff * 2^attempt, capped at maxBackoff.'''
+        return random.uniform(0, min(self.maxBackoff, self.backoff * 2 ** attempt))
+
+    def refreshToken(self, expiredHeader):
+        with self.authLock:
+            if self.headers.get('Authorization') == expiredHeader:
+                self.headers.update(auth(self, *self.credentials, linkApp=False))
+
+def retryAfter(response):
+    '''Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None if there is none.'''
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def run(orgId, appId, appSecret, templatesCSV, environment='Sandbox', workers=8, reporter=None,
+        cacheDir=None, cacheTtl=3600, cacheDelta=False, refreshCache=False, journalPath=None, resume=False, dryRun=False,
+        timeout=30, retries=5, rateLimit=None, reportPath=None, tracePath=None, adapter=None, limiter=None):
+    '''Library entry point
+    Creates the templates in `templatesCSV` on Org `orgId`, acting as app `appId`, and returns a summary dict; the keyword options follow the command line flags.
+    '''
+    reporter = reporter or textReporter()
+    workers = max(int(workers), 1)
+    server = environments.get(environment, environment)
+    if journalPath and not dryRun:
+        checkJournal(journalPath, server, orgId, resume)
+    metrics = runMetrics(trace=bool(tracePath))
+    org = orgRun(orgId, meritSession(server, workers, timeout, retries, rateLimit=rateLimit, metrics=metrics, adapter=adapter, limiter=limiter))
+    with metrics.span('auth'):
+        org.session.login(orgId, appId, appSecret, reporter)
+
+    if cacheDir:
+        # a resumed run may have lost journal entries for things it created, so those must come from the Org, not the snapshot
+        snapshot = orgSnapshot(cacheDir, server, orgId, cacheTtl, cacheDelta or resume)
+        if refreshCache:
+            snapshot.invalidate()
+        with metrics.span('loadOrg'):
+            templates, fields = snapshot.load(org)
+        if not dryRun:
+            snapshot.begin()
+    else:
+        snapshot = None
+        with metrics.span('getTemplates'):
+            templates = getTemplates(org)[0]
+        with metrics.span('getFields'):
+            fields = getFields(org)
+    org.templateIndex = nameIndex(templates, 'title')
+    org.fieldIndex = nameIndex(fields, 'fieldName')
+    org.journal = runJournal(journalPath, server, orgId, resume) if journalPath and not dryRun else None
+    if org.journal:
+        for field in org.journal.fields:
+            org.fieldIndex.add(field)
+        for meritTemplate in org.journal.templates:
+            org.templateIndex.add(meritTemplate)
+
+    summary = {'orgId': orgId, 'templates': 0, 'changes': {}, 'failed': [], 'error': None}
+    newNames = {'createField': set(), 'createTemplate': set()}
+    total = countTemplateRows(templatesCSV)
+    headerRows = 0 if isJsonLines(templatesCSV) else 1
+    completed = False
+    try:
+        with metrics.span('pipeline'):
+            for result in templatesPipeline(org, templatesCSV, workers, dryRun):
+                if 'error' in result:
+                    summary['error'] = result['error']
+                    reporter.error(result['error'])
+                    break
+                summary['templates'] += 1
+                metrics.rows += 1
+                if 'failed' in result:
+                    summary['failed'].append({'row': result['row'], 'title': result['title'], 'error': result['failed']})
+                    reporter.error(orgId + ': row ' + str(result['row']) + ' (' + result['title'] + ') failed: ' + result['failed'])
+                # several rows can plan the same new field or template; it is only created once, so it is only counted and reported once
+                result['plan'] = [op for op in result['plan'] if op['action'] not in newNames or
+                                  normaliseName(op.get('fieldName', op.get('title'))) not in newNames[op['action']]]
+                for op in result['plan']:
+                    if op['action'] in newNames:
+                        newNames[op['action']].add(normaliseName(op.get('fieldName', op.get('title'))))
+                    summary['changes'][op['action']] = summary['changes'].get(op['action'], 0) + 1
+                if dryRun:
+                    reporter.plan(result)
+                reporter.progress('Template and Field Creation Progress (' + orgId + ')', result['lastRow'] - headerRows, total)
+        completed = not summary['error'] and not summary['failed']
+    finally:
+        if org.journal:
+            org.journal.close(finished=completed)
+        # after a failed row the Org may hold something the index does not (a POST answered 504 after it was applied), so the
+        # snapshot is left marked by `begin` and the next run refreshes it with a delta
+        if snapshot and completed:
+            snapshot.save(list(org.templateIndex.items.values()), list(org.fieldIndex.items.values()))
+        if reportPath:
+            metrics.writeReport(reportPath)
+        if tracePath:
+            metrics.writeTrace(tracePath)
+    summary['metrics'] = metrics.report()
+    return summary
+
+def perOrgPath(path, orgId):
+    '''`path` with the orgId added before the extension, so each Org of a fan-out run gets its own file.'''
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return root + '.' + orgId + ext
+
+def runOrgs(orgIds, appId, appSecret, templatesCSV, environment='Sandbox', workers=8, reporter=None, orgWorkers=4,
+            journalPath=None, reportPath=None, tracePath=None, **options):
+    '''Multi-Org fan-out
+    Runs the same sheet against every Org in `orgIds`, up to `orgWorkers` at a time, and returns their summaries with combined totals.
+    '''
+    reporter = reporter or textReporter()
+    orgWorkers = max(int(orgWorkers), 1)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(int(workers) * orgWorkers, 10))
+    limiter = rateLimiter(options.pop('rateLimit', None))
+
+    def runOne(orgId):
+        try:
+            return run(orgId, appId, appSecret, templatesCSV, environment, workers, reporter,
+                       journalPath=perOrgPath(journalPath, orgId), reportPath=perOrgPath(reportPath, orgId),
+                       tracePath=perOrgPath(tracePath, orgId), adapter=adapter, limiter=limiter, **options)
+        except Exception as error:
+            reporter.error(orgId + ': ' + str(error))
+            return {'orgId': orgId, 'templates': 0, 'changes': {}, 'failed': [], 'error': str(error)}
+
+    with ThreadPoolExecutor(max_workers=orgWorkers) as pool:
+        summaries = list(pool.map(runOne, orgIds))
+    return {
+        'orgs': summaries,
+        'templates': sum(summary['templates'] for summary in summaries),
+        'failedRows': sum(len(summary['failed']) for summary in summaries),
+        'erroredOrgs': [summary['orgId'] for summary in summaries if summary['error']]
+    }
+
+def exportedTemplates(org, workers=8):
+    '''Export reader
+    Yields (meritTemplate, fieldSettings, listed) for every template of the Org, in pagination order; `listed` is the number of templates paged through so far.
+    Pages are walked in order while up to `workers` templates have their field settings read at once, with at most `workers * 2` templates in flight.
+    '''
+    inFlight = deque()
+    listed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for page, startingAfter in templatePages(org):
+            listed += len(page)
+            for meritTemplate in page:
+                inFlight.append((meritTemplate, pool.submit(getTemplateFieldSettings, org, meritTemplate['id'])))
+                while len(inFlight) >= workers * 2:
+                    meritTemplate, future = inFlight.popleft()
+                    yield meritTemplate, future.result(), listed
+        while inFlight:
+            meritTemplate, future = inFlight.popleft()
+            yield meritTemplate, future.result(), listed
+
+def templateRecord(meritTemplate, fieldSettings, fieldsById):
+    '''One template as a JSON Lines input record, its fields in the order of its field settings.
+    A setting whose field is not in the Org's field list, and has no name of its own, cannot be written back and is left out.
+    '''
+    coverPhoto = meritTemplate.get('coverPhoto') or {}
+    record = {
+        'title': meritTemplate['title'],
+        'description': meritTemplate.get('description') or '',
+        'canOnlyBeSentOnce': bool(meritTemplate.get('canOnlyBeSentOnce')),
+        'coverPhotoId': coverPhoto.get('id') or '',
+        'coverPhotoFileName': coverPhoto.get('fileName') or '',
+        'fields': []
+    }
+    for fieldId, setting in fieldSettings.items():
+        field = fieldsById.get(fieldId, {})
+        name = field.get('fieldName') or setting.get('fieldName')
+        if not name:
+            continue
+        record['fields'].append({
+            'name': name,
+            'fieldType': field.get('fieldType') or setting.get('fieldType') or '',
+            'description': field.get('description') or setting.get('description') or '',
+            'newEnabled': bool(setting.get('newEnabled')),
+            'newRequired': bool(setting.get('newRequired')),
+            'newValueForAllMerits': setting.get('newValueForAllMerits') or ''
+        })
+    return record
+
+def recordRows(record, groups):
+    '''A template record as CSV rows with `groups` field groups each.
+    A template with more fields than that carries on in further rows with the same title, which the creator adds to the same template; one with none is a single row.
+    '''
+    templateCells = [jsonCell(record[key]) for key in templateKeys]
+    fields = record['fields'] or [None]
+    for start in range(0, len(fields), groups):
+        row = list(templateCells)
+        for field in fields[start:start + groups]:
+            row.extend(jsonCell(field[key]) if field else '' for key in fieldKeys)
+        row.extend([''] * (len(templateColumns) + len(fieldColumns) * groups - len(row)))
+        yield row
+
+def recordErrors(record, validators):
+    '''Checks an exported record against the column rules, so a template the creator would reject is not written; `validators` caches one per field count.'''
+    groups = max(len(record['fields']), 1)
+    if groups not in validators:
+        validators[groups] = recordValidator(layoutHeader(groups))
+    return validators[groups].errors(1, next(recordRows(record, groups)))
+
+def exportOrg(orgId, appId, appSecret, outputPath, environment='Sandbox', workers=8, reporter=None, layout=None,
+              timeout=30, retries=5, rateLimit=None, reportPath=None, tracePath=None, adapter=None):
+    '''Export entry point
+    Writes every template of Org `orgId`, with its fields and field settings, to `outputPath` in a layout the creator reads back.
+    '''
+    reporter = reporter or textReporter()
+    workers = max(int(workers), 1)
+    layout = layout or ('jsonl' if isJsonLines(outputPath) else 'wide')
+    server = environments.get(environment, environment)
+    metrics = runMetrics(trace=bool(tracePath))
+    org = orgRun(orgId, meritSession(server, workers, timeout, retries, rateLimit=rateLimit, metrics=metrics, adapter=adapter))
+    with metrics.span('auth'):
+        org.session.login(orgId, appId, appSecret, reporter)
+
+    summary = {'orgId': orgId, 'path': outputPath, 'layout': layout, 'templates': 0, 'fields': 0, 'skipped': []}
+    validators = {}
+    seen = 0
+    tmpPath = outputPath + '.tmp'
+    try:
+        with metrics.span('getFields'):
+            fieldsById = {field['id']: field for field in getFields(org)}
+        with metrics.span('export'), open(tmpPath, 'w', newline='') as outfile:
+            writer = csv.writer(outfile)
+            groups = 1 if layout == 'long' else maxFields
+            if layout != 'jsonl':
+                writer.writerow(layoutHeader(groups))
+            for meritTemplate, fieldSettings, listed in exportedTemplates(org, workers):
+                seen += 1
+                reporter.progress('Template Export Progress (' + orgId + ')', seen, listed)
+                record = templateRecord(meritTemplate, fieldSettings, fieldsById)
+                errors = recordErrors(record, validators)
+                if errors:
+                    keys = [error['column'] + ' (' + error['rule'] + ')' for error in errors]
+                    summary['skipped'].append({'title': record['title'], 'id': meritTemplate['id'], 'errors': keys})
+                    reporter.error(orgId + ': skipped template ' + json.dumps(record['title']) + ', it would not pass validation: ' + ', '.join(keys))
+                    continue
+                if layout == 'jsonl':
+                    outfile.write(json.dumps(record) + '\n')
+                else:
+                    writer.writerows(recordRows(record, groups))
+                summary['templates'] += 1
+                summary['fields'] += len(record['fields'])
+                metrics.rows += 1
+        os.replace(tmpPath, outputPath)
+    finally:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        if reportPath:
+            metrics.writeReport(reportPath)
+        if tracePath:
+            metrics.writeTrace(tracePath)
+    summary['metrics'] = metrics.report()
+    return summary
+
+def parseArgs(argv):
+    '''Command line arguments; credentials and environment fall back to MERIT_* environment variables.'''
+    parser = argparse.ArgumentParser(description='Create Merit templates in bulk from a formatted CSV.')
+    parser.add_argument('csv', nargs='?', help='path to the templates CSV')
+    parser.add_argument('--org-id', default=os.environ.get('MERIT_ORG_ID'), help='orgId, or a comma separated list of orgIds to roll the sheet out to')
+    parser.add_argument('--orgs-file', help='file with one orgId per line, added to --org-id')
+    parser.add_argument('--org-workers', type=int, default=4, help='Orgs processed in parallel when there are several (default 4)')
+    parser.add_argument('--app-id', default=os.environ.get('MERIT_APP_ID'))
+    parser.add_argument('--app-secret', default=os.environ.get('MERIT_APP_SECRET'))
+    parser.add_argument('--environment', default=os.environ.get('MERIT_ENVIRONMENT', 'Sandbox'),
+                        help='Staging, Sandbox, Production, or an API base URL (default Sandbox)')
+    parser.add_argument('--workers', type=int, default=8, help='rows processed in parallel (default 8)')
+    parser.add_argument('--progress', choices=['text', 'json'], default='text', help='progress output format (default text)')
+    parser.add_argument('--progress-interval', type=float, default=2.0, help='minimum seconds between progress updates (default 2)')
+    parser.add_argument('--cache-dir', default=defaultCacheDir(), help='where Org snapshots are kept (default ' + defaultCacheDir() + ')')
+    parser.add_argument('--no-cache', action='store_true', help='always fetch templates and fields from the API')
+    parser.add_argument('--cache-ttl', type=float, default=3600, help='seconds before a snapshot is fetched in full again (default 3600)')
+    parser.add_argument('--cache-delta', action='store_true', help='refresh a fresh snapshot with templates added since it was taken')
+    parser.add_argument('--refresh-cache', action='store_true', help='discard the snapshot and fetch everything again')
+    parser.add_argument('--journal', help='checkpoint journal path (default: the CSV path plus .journal)')
+    parser.add_argument('--resume', action='store_true', help='skip work the journal records as done by an earlier, interrupted run')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds before an API call times out (default 30)')
+    parser.add_argument('--retries', type=int, default=5, help='retries for failed or throttled API calls (default 5)')
+    parser.add_argument('--rate-limit', type=float, help='maximum API requests per second across all workers')
+    parser.add_argument('--report', help='write a JSON run report (per-endpoint counts, latency histograms, retries, bytes, stage times) here; with --validate-only, every validation error')
+    parser.add_argument('--trace', help='write a Chrome trace of every API call and stage here (chrome://tracing, Perfetto)')
+    parser.add_argument('--plan', action='store_true', help='dry run: print the changes each row needs without making them')
+    parser.add_argument('--validate-only', action='store_true', help='check the whole CSV, reporting every error, without calling the API')
+    parser.add_argument('--processes', type=int, help='worker processes for validating the CSV (default: one per core)')
+    parser.add_argument('--no-prevalidate', action='store_true',
+                        help='start on the rows without checking the whole CSV first; rows before an invalid one are then still applied')
+    parser.add_argument('--export', metavar='PATH', help='write the Org\'s templates and field settings to PATH instead of creating any (JSON Lines for .jsonl, otherwise CSV)')
+    parser.add_argument('--export-layout', choices=['wide', 'long'], default='wide',
+                        help='CSV export layout: the template CSV, or one row per template and field (default wide)')
+    parser.add_argument('--gui', action='store_true', help='use the PySimpleGUI popups (the default when no arguments are given)')
+    args = parser.parse_args(argv)
+    if not args.gui and not args.csv and not args.export:
+        parser.error('a CSV path is required unless --gui or --export is used')
+    args.org_ids = [orgId.strip() for orgId in (args.org_id or '').split(',') if orgId.strip()]
+    if args.orgs_file:
+        with open(args.orgs_file) as infile:
+            args.org_ids += [line.strip() for line in infile if line.strip()]
+    if not args.gui and not args.validate_only and not (args.org_ids and args.app_id and args.app_secret):
+        parser.error('--org-id (or --orgs-file), --app-id and --app-secret (or MERIT_ORG_ID, MERIT_APP_ID, MERIT_APP_SECRET) are required')
+    return args
+
+def summaryLine(summary, dryRun):
+    '''One line text summary of a `run` result.'''
+    changes = ', '.join(action + ': ' + str(count) for action, count in sorted(summary['changes'].items())) or 'none'
+    line = summary['orgId'] + ': ' + ('plan' if dryRun else 'job') + (' failed' if summary['error'] else ' complete') + ', ' + str(summary['templates']) + \
+        ' templates processed. Changes: ' + changes + '.'
+    if summary['failed']:
+        line += ' Failed rows: ' + str(len(summary['failed'])) + '.'
+    if summary['error']:
+        line += ' Error: ' + summary['error'].split('\n')[0]
+    return line
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        argv = ['--gui']
+    args = parseArgs(argv)
+    if args.gui:
+        reporter = guiReporter()
+        values = userInput()
+        if values is None:
+            return 0
+        orgId, appId, appSecret, templatesCSV, filePath, server, workers = values
+        if not templatesFileValidation(templatesCSV, reporter):
+            return 1
+        summary = run(orgId, appId, appSecret, templatesCSV, server, workers, reporter)
+        sg.popup('Job complete')
+        return 1 if summary['error'] else 0
+    if args.progress == 'json':
+        reporter = jsonReporter(args.progress_interval)
+    else:
+        reporter = textReporter(args.progress_interval)
+    if args.validate_only:
+        return 0 if templatesFileValidation(args.csv, reporter, args.processes, args.report) else 1
+    if args.export:
+        layout = None if isJsonLines(args.export) else args.export_layout
+        skipped = False
+        for orgId in args.org_ids:
+            multiple = len(args.org_ids) > 1
+            summary = exportOrg(orgId, args.app_id, args.app_secret, perOrgPath(args.export, orgId) if multiple else args.export,
+                                args.environment, args.workers, reporter, layout, args.timeout, args.retries, args.rate_limit,
+                                perOrgPath(args.report, orgId) if multiple else args.report,
+                                perOrgPath(args.trace, orgId) if multiple else args.trace)
+            if args.progress == 'json':
+                reporter.write(json.dumps(dict({key: value for key, value in summary.items() if key != 'metrics'}, event='exportSummary')))
+            else:
+                reporter.message(orgId + ': exported ' + str(summary['templates']) + ' templates with ' + str(summary['fields']) +
+                                 ' field settings to ' + summary['path'] + '. Skipped: ' + str(len(summary['skipped'])) + '.')
+            skipped = skipped or bool(summary['skipped'])
+        return 1 if skipped else 0
+    if not args.no_prevalidate and not templatesFileValidation(args.csv, reporter, args.processes):
+        return 1
+    options = {
+        'cacheDir': None if args.no_cache else args.cache_dir, 'cacheTtl': args.cache_ttl, 'cacheDelta': args.cache_delta,
+        'refreshCache': args.refresh_cache, 'journalPath': args.journal or args.csv + '.journal', 'resume': args.resume,
+        'dryRun': args.plan, 'timeout': args.timeout, 'retries': args.retries, 'rateLimit': args.rate_limit,
+        'reportPath': args.report, 'tracePath': args.trace
+    }
+    if len(args.org_ids) > 1:
+        combined = runOrgs(args.org_ids, args.app_id, args.app_secret, args.csv, args.environment, args.workers, reporter,
+                           args.org_workers, **options)
+        summaries = combined['orgs']
+    else:
+        try:
+            summaries = [run(args.org_ids[0], args.app_id, args.app_secret, args.csv, args.environment, args.workers, reporter, **options)]
+        except ValueError as error:
+            reporter.error(str(error))
+            return 1
+    for summary in summaries:
+        if args.progress == 'json':
+            reporter.write(json.dumps(dict({key: value for key, value in summary.items() if key != 'metrics'}, event='summary')))
+        else:
+            reporter.message(summaryLine(summary, args.plan))
+    if len(summaries) > 1:
+        if args.progress == 'json':
+            reporter.write(json.dumps(dict({key: value for key, value in combined.items() if key != 'orgs'}, event='combinedSummary')))
+        else:
+            reporter.message('All Orgs: ' + str(combined['templates']) + ' templates processed across ' + str(len(summaries)) +
+                             ' Orgs; ' + str(combined['failedRows']) + ' failed rows; Orgs with errors: ' +
+                             (', '.join(combined['erroredOrgs']) or 'none') + '.')
+    return 1 if any(summary['error'] or summary['failed'] for summary in summaries) else 0
+
 if __name__ == '__main__':
-    orgId, appId, appSecret, templatesCSV, filePath, server = userInput()
-
-    s = requests.Session()
-    s.url = server
-    authHeader = auth(orgId, appId, appSecret)
-    s.headers.update(authHeader)
-
-    orgTemplates = getTemplates()
-    fieldsList = getFields()
-
-    valid = templatesFileValidation(templatesCSV)
-    if valid:
-        newTemplates = templatesFileIngestion(templatesCSV)
-        totalLength = 0
-        index = 0
-        for template in newTemplates:
-            totalLength += 1
-        for template in newTemplates:
-            sg.OneLineProgressMeter('Field Setting Creation Progress', index,
-                                    totalLength, 'key', 'Total templates being updated with fields:')
-            index += 1
-            addFieldSettings(template)
-    sg.popup('Job complete')
\ No newline at end of file
+    sys.exit(main())
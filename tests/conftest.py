@@ -0,0 +1,53 @@
+import csv
+import os
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'benchmarks'))
+
+import templates_creator
+from mock_merit_api import startMockMerit
+
+class quietReporter(templates_creator.textReporter):
+    '''Collects messages and errors instead of printing them.'''
+    def __init__(self):
+        templates_creator.textReporter.__init__(self, interval=3600)
+        self.lines = []
+
+    def write(self, text):
+        self.lines.append(text)
+
+    def linkApp(self, linkUrl):
+        raise AssertionError('link flow entered: ' + linkUrl)
+
+@pytest.fixture
+def mock():
+    '''A fresh mock Merit API; yields (state, baseUrl).'''
+    server, baseUrl = startMockMerit()
+    yield server.RequestHandlerClass.state, baseUrl
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def reporter():
+    return quietReporter()
+
+def templateRow(title, fields=(), description='Description', canOnlyBeSentOnce='FALSE'):
+    '''One data row: template cells followed by a field group per (name, fieldType) in `fields`.'''
+    row = [title, description, canOnlyBeSentOnce, '', '']
+    for name, fieldType in fields:
+        row += [name, fieldType, 'Field description', 'TRUE', 'FALSE', '']
+    return row
+
+def writeCsv(path, rows, groups):
+    '''Writes `rows` under the header for `groups` field groups, padding each row with blank groups.'''
+    header = templates_creator.layoutHeader(groups)
+    with open(path, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row + [''] * (len(header) - len(row)))
+    return str(path)
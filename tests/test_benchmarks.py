@@ -0,0 +1,13 @@
+import multiprocessing
+import sys
+
+import pytest
+
+from run_benchmarks import waitForResult
+
+def test_a_run_that_dies_without_a_result_fails_instead_of_hanging():
+    queue = multiprocessing.Queue()
+    client = multiprocessing.Process(target=sys.exit, args=(3,))
+    client.start()
+    with pytest.raises(RuntimeError, match='exited with code 3'):
+        waitForResult(queue, client, 60)
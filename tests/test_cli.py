@@ -0,0 +1,74 @@
+import sys
+
+import pytest
+
+import templates_creator
+from conftest import templateRow, writeCsv
+
+def test_credentials_fall_back_to_environment_variables(monkeypatch):
+    monkeypatch.setenv('MERIT_ORG_ID', 'org')
+    monkeypatch.setenv('MERIT_APP_ID', 'appId')
+    monkeypatch.setenv('MERIT_APP_SECRET', 'appSecret')
+    monkeypatch.setenv('MERIT_ENVIRONMENT', 'Production')
+    args = templates_creator.parseArgs(['sheet.csv', '--app-id', 'other'])
+    assert (args.org_id, args.app_id, args.app_secret, args.environment) == ('org', 'other', 'appSecret', 'Production')
+
+def test_missing_credentials_are_an_error(monkeypatch):
+    for name in ['MERIT_ORG_ID', 'MERIT_APP_ID', 'MERIT_APP_SECRET']:
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(SystemExit):
+        templates_creator.parseArgs(['sheet.csv', '--org-id', 'org'])
+    assert templates_creator.parseArgs(['sheet.csv', '--validate-only']).validate_only
+
+def test_validate_only_exit_status_without_the_gui(tmp_path, capsys):
+    good = writeCsv(tmp_path / 'good.csv', [templateRow('Title', [('Field', 'ShortText')])], 2)
+    bad = writeCsv(tmp_path / 'bad.csv', [templateRow('Title', [('Field', 'Text')])], 2)
+    assert templates_creator.main(['--validate-only', good]) == 0
+    assert templates_creator.main(['--validate-only', bad]) == 1
+    assert 'Row: 2 Col: 7' in capsys.readouterr().err
+    assert 'PySimpleGUI' not in sys.modules
+
+def test_unfinished_journal_is_reported_before_logging_in(tmp_path, capsys, mock):
+    state, baseUrl = mock
+    path = writeCsv(tmp_path / 'sheet.csv', [templateRow('Title', [('Field', 'ShortText')])], 2)
+    templates_creator.runJournal(path + '.journal', baseUrl, 'org').close()
+    argv = [path, '--org-id', 'org', '--app-id', 'appId', '--app-secret', 'appSecret', '--environment', baseUrl, '--no-cache']
+    assert templates_creator.main(argv) == 1
+    assert 'did not finish' in capsys.readouterr().err
+    assert state.stats == {}
+
+def test_invalid_sheet_changes_nothing_unless_prevalidation_is_skipped(tmp_path, capsys, mock):
+    state, baseUrl = mock
+    rows = [templateRow('Title ' + str(num), [('Field', 'ShortText')]) for num in range(5)] + [templateRow('Bad', [('Field', 'Text')])]
+    path = writeCsv(tmp_path / 'sheet.csv', rows, 2)
+    argv = [path, '--org-id', 'org', '--app-id', 'appId', '--app-secret', 'appSecret', '--environment', baseUrl, '--no-cache']
+    assert templates_creator.main(argv) == 1
+    assert state.stats == {}
+    assert templates_creator.main(argv + ['--no-prevalidate', '--workers', '1']) == 1
+    assert state.stats['POST merittemplates 200'] == 5
+    assert 'org: job failed, 5 templates processed.' in capsys.readouterr().err
+
+class fakeGui:
+    '''Stands in for PySimpleGUI: every element is a no-op, and the window returns `events` from Read in turn.'''
+    def __init__(self, *events):
+        self.events = list(events)
+        self.closed = False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def Window(self, *args, **kwargs):
+        return self
+
+    def Read(self, timeout=None):
+        return self.events.pop(0)
+
+    def Close(self):
+        self.closed = True
+
+@pytest.mark.parametrize('event', [(None, None), ('Cancel', {'Environment': 'Sandbox'})])
+def test_closing_or_cancelling_the_popup_exits_cleanly(monkeypatch, event):
+    gui = fakeGui(('__TIMEOUT__', {'Environment': 'Sandbox'}), event)
+    monkeypatch.setattr(templates_creator, 'sg', gui)
+    assert templates_creator.main(['--gui']) == 0
+    assert gui.closed and gui.events == []
@@ -0,0 +1,46 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import templates_creator
+
+def test_names_are_matched_after_normalising_whitespace():
+    index = templates_creator.nameIndex([{'title': ' Existing   template '}, {'title': 'Existing template'}], 'title')
+    assert index.get('Existing template') == {'title': ' Existing   template '}
+    assert index.get('existing template') is None
+    assert len(index) == 1
+
+def test_get_or_create_creates_each_name_once_under_concurrency():
+    index = templates_creator.nameIndex([{'title': 'Existing'}], 'title')
+    calls = []
+    start = threading.Barrier(16)
+
+    def create():
+        calls.append(1)
+        time.sleep(0.05)
+        return {'title': 'New'}
+
+    def worker(name):
+        start.wait()
+        return index.getOrCreate(name, create)
+
+    threads = [threading.Thread(target=worker, args=(' New ' if num % 2 else 'New',)) for num in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert index.getOrCreate('Existing', create) == {'title': 'Existing'}
+    assert len(calls) == 1
+
+def test_failed_creation_is_not_cached():
+    index = templates_creator.nameIndex([], 'title')
+
+    def fail():
+        raise requests.ConnectionError('down')
+
+    with pytest.raises(requests.ConnectionError):
+        index.getOrCreate('New', fail)
+    assert index.getOrCreate('New', lambda: {'title': 'New'}) == {'title': 'New'}
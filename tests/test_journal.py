@@ -0,0 +1,48 @@
+import json
+import time
+
+import pytest
+
+import templates_creator
+
+def test_load_skips_a_torn_last_line(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = templates_creator.runJournal(path, 'server', 'org')
+    journal.record('field', {'id': 'f1', 'fieldName': 'Field'})
+    journal.record('template', {'id': 't1', 'title': 'Template'})
+    journal.record('setting', {'templateId': 't1', 'fieldId': 'f1'})
+    journal.close()
+    with open(path, 'a') as outfile:
+        outfile.write('{"op": "setting", "data": {"templ')
+    resumed = templates_creator.runJournal(path, 'server', 'org', resume=True)
+    assert resumed.fields == [{'id': 'f1', 'fieldName': 'Field'}]
+    assert resumed.templates == [{'id': 't1', 'title': 'Template'}]
+    assert resumed.settingDone('t1', 'f1')
+    resumed.close()
+
+def test_resume_against_another_org_is_refused(tmp_path):
+    path = str(tmp_path / 'journal')
+    templates_creator.runJournal(path, 'server', 'org').close(finished=True)
+    with pytest.raises(ValueError):
+        templates_creator.runJournal(path, 'server', 'otherOrg', resume=True)
+
+def test_unfinished_journal_is_not_overwritten(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = templates_creator.runJournal(path, 'server', 'org')
+    journal.record('field', {'id': 'f1', 'fieldName': 'Field'})
+    journal.close()
+    with pytest.raises(ValueError):
+        templates_creator.runJournal(path, 'server', 'org')
+    templates_creator.runJournal(path, 'server', 'org', resume=True).close(finished=True)
+    templates_creator.runJournal(path, 'server', 'org').close()
+    with open(path) as infile:
+        assert [json.loads(line)['op'] for line in infile] == ['start']
+
+def test_buffered_entries_are_flushed_without_further_records(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = templates_creator.runJournal(path, 'server', 'org', interval=0.05)
+    journal.record('field', {'id': 'f1', 'fieldName': 'Field'})
+    time.sleep(0.3)
+    with open(path) as infile:
+        assert '"f1"' in infile.read()
+    journal.close()
@@ -0,0 +1,34 @@
+import json
+
+import templates_creator
+
+def test_endpoint_names_replace_ids():
+    metrics = templates_creator.runMetrics()
+    server = 'https://api.example.com/v2/'
+    assert metrics.endpointName('post', server + 'orgs/abc/access', server) == 'POST orgs/{id}/access'
+    assert metrics.endpointName('get', server + 'merittemplates/t1/fields/f1?x=1', server) == 'GET merittemplates/{id}/fields/{id}'
+    assert metrics.endpointName('get', server + 'orgs/abc/fields', server) == 'GET orgs/{id}/fields'
+
+def test_report_sums_calls_retries_and_latency_buckets():
+    metrics = templates_creator.runMetrics()
+    metrics.recordRequest('GET fields', 503, 0.0, 0.002, bytesReceived=10)
+    metrics.recordRetry('GET fields')
+    metrics.recordRequest('GET fields', 200, 0.0, 0.3, bytesReceived=90)
+    report = metrics.report()
+    stats = report['endpoints']['GET fields']
+    assert (report['requests'], report['retries']) == (2, 1)
+    assert stats['statuses'] == {'503': 1, '200': 1}
+    assert stats['bytesReceived'] == 100
+    assert stats['latencyHistogram'][0] == 1 and stats['latencyHistogram'][6] == 1
+
+def test_trace_has_an_event_per_call_and_stage(tmp_path):
+    metrics = templates_creator.runMetrics(trace=True)
+    for num in range(3):
+        with metrics.span('row', {'row': num}):
+            metrics.recordRequest('GET fields', 200, 0.0, 0.01)
+    assert metrics.report()['stages']['row']['count'] == 3
+    path = str(tmp_path / 'trace.json')
+    metrics.writeTrace(path)
+    with open(path) as infile:
+        events = json.load(infile)['traceEvents']
+    assert sorted(event['cat'] for event in events) == ['api'] * 3 + ['stage'] * 3
@@ -0,0 +1,8 @@
+import requests
+
+def test_scripted_statuses_are_answered_before_normal_handling(mock):
+    state, baseUrl = mock
+    state.script('GET orgs/{id}/fields', 503, 429)
+    statuses = [requests.get(baseUrl + 'orgs/org/fields').status_code for num in range(3)]
+    assert statuses == [503, 429, 401]
+    assert state.stats == {'GET orgs/{id}/fields 503': 1, 'GET orgs/{id}/fields 429': 1, 'GET orgs/{id}/fields 401': 1}
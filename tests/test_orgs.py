@@ -0,0 +1,16 @@
+import templates_creator
+from conftest import templateRow, writeCsv
+
+def test_per_org_paths():
+    assert templates_creator.perOrgPath('runs/report.json', 'org1') == 'runs/report.org1.json'
+    assert templates_creator.perOrgPath(None, 'org1') is None
+
+def test_an_org_that_cannot_run_does_not_stop_the_others(tmp_path, mock, reporter):
+    state, baseUrl = mock
+    path = writeCsv(tmp_path / 'sheet.csv', [templateRow('Template', [('Field', 'ShortText')])], 2)
+    state.script('POST orgs/{id}/access', 403)
+    summary = templates_creator.runOrgs(['org1', 'org2'], 'appId', 'appSecret', path, baseUrl, 2, reporter, orgWorkers=1,
+                                        reportPath=str(tmp_path / 'report.json'))
+    assert [org['orgId'] for org in summary['orgs']] == ['org1', 'org2']
+    assert summary['erroredOrgs'] == ['org1'] and summary['templates'] == 1
+    assert (tmp_path / 'report.org2.json').exists()
@@ -0,0 +1,30 @@
+import templates_creator
+from conftest import templateRow
+
+def planFor(monkeypatch, row, templates=(), fields=(), settings=None):
+    header = templates_creator.headerRow
+    row = row + [''] * (len(header) - len(row))
+    org = templates_creator.orgRun('org', None, templates_creator.nameIndex(list(templates), 'title'),
+                                   templates_creator.nameIndex(list(fields), 'fieldName'))
+    monkeypatch.setattr(templates_creator, 'getTemplateFieldSettings', lambda org, templateId: settings or {})
+    return templates_creator.planTemplate(org, templates_creator.templateFromRow(row))
+
+def test_new_template_plans_every_operation_in_order(monkeypatch):
+    plan = planFor(monkeypatch, templateRow('T', [('New', 'ShortText'), ('Existing', 'Date')]),
+                   fields=[{'id': 'f2', 'fieldName': 'Existing', 'fieldType': 'Date', 'description': 'd'}])
+    assert [(op['action'], op.get('fieldName')) for op in plan] == [
+        ('createField', 'New'), ('createTemplate', None), ('setField', 'New'), ('setField', 'Existing')]
+
+def test_unchanged_template_plans_nothing(monkeypatch):
+    template = {'id': 't1', 'title': 'T', 'description': 'Description', 'canOnlyBeSentOnce': False}
+    field = {'id': 'f1', 'fieldName': 'F', 'fieldType': 'ShortText', 'description': 'd'}
+    settings = {'f1': {'fieldId': 'f1', 'newEnabled': True, 'newRequired': False}}
+    assert planFor(monkeypatch, templateRow('T', [('F', 'ShortText')]), [template], [field], settings) == []
+
+def test_only_the_differences_are_planned(monkeypatch):
+    template = {'id': 't1', 'title': 'T', 'description': 'Old', 'canOnlyBeSentOnce': False}
+    field = {'id': 'f1', 'fieldName': 'F', 'fieldType': 'ShortText', 'description': 'd'}
+    settings = {'f1': {'fieldId': 'f1', 'newEnabled': True, 'newRequired': True}}
+    plan = planFor(monkeypatch, templateRow('T', [('F', 'ShortText')]), [template], [field], settings)
+    assert plan == [{'action': 'updateTemplate', 'title': 'T', 'changes': {'description': 'Description'}},
+                    {'action': 'setField', 'title': 'T', 'fieldName': 'F', 'changes': {'newRequired': False}}]
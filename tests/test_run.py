@@ -0,0 +1,75 @@
+import json
+
+import templates_creator
+from conftest import templateRow, writeCsv
+
+def runSheet(path, baseUrl, reporter, **options):
+    return templates_creator.run('org', 'appId', 'appSecret', path, baseUrl, 4, reporter, journalPath=path + '.journal', **options)
+
+def writes(state):
+    return {key: count for key, count in state.stats.items() if not key.startswith('GET') and 'access' not in key}
+
+def test_unchanged_rerun_makes_no_writes(tmp_path, mock, reporter):
+    state, baseUrl = mock
+    rows = [templateRow('Template ' + str(num), [('Field ' + str(num % 3), 'ShortText'), ('Shared', 'Date')]) for num in range(10)]
+    path = writeCsv(tmp_path / 'sheet.csv', rows, 2)
+    summary = runSheet(path, baseUrl, reporter)
+    assert summary['changes'] == {'createField': 4, 'createTemplate': 10, 'setField': 20}
+    assert not summary['failed'] and summary['error'] is None
+    state.stats = {}
+    summary = runSheet(path, baseUrl, reporter)
+    assert summary['changes'] == {}
+    assert writes(state) == {}
+
+def test_repeated_new_template_is_counted_once(tmp_path, mock, reporter):
+    state, baseUrl = mock
+    rows = [templateRow('A', [('f1', 'ShortText')]), templateRow('B', [('f1', 'ShortText')]), templateRow('A', [('f2', 'ShortText')])]
+    path = writeCsv(tmp_path / 'long.csv', rows, 1)
+    planned = runSheet(path, baseUrl, reporter, dryRun=True)
+    summary = runSheet(path, baseUrl, reporter)
+    assert planned['changes'] == summary['changes'] == {'createField': 2, 'createTemplate': 2, 'setField': 3}
+    assert state.stats['POST merittemplates 200'] == 2
+
+def test_snapshot_is_refreshed_after_a_failed_row(tmp_path, mock, reporter):
+    state, baseUrl = mock
+    path = writeCsv(tmp_path / 'sheet.csv', [templateRow('T1', [('f1', 'ShortText')])], 1)
+    cacheDir = str(tmp_path / 'cache')
+    runSheet(writeCsv(tmp_path / 'other.csv', [templateRow('T0')], 1), baseUrl, reporter, cacheDir=cacheDir)
+    state.script('POST merittemplates', 504)
+    assert len(runSheet(path, baseUrl, reporter, cacheDir=cacheDir)['failed']) == 1
+    # the 504 came after the API had created the template
+    state.addTemplate({'title': 'T1', 'description': 'Description', 'canOnlyBeSentOnce': False})
+    summary = runSheet(path, baseUrl, reporter, cacheDir=cacheDir, resume=True)
+    assert not summary['failed'] and 'createTemplate' not in summary['changes']
+    assert [template['title'] for template in state.templates] == ['T0', 'T1']
+
+def test_resume_refreshes_the_snapshot(tmp_path, mock, reporter):
+    state, baseUrl = mock
+    path = writeCsv(tmp_path / 'sheet.csv', [templateRow('T0'), templateRow('T1')], 1)
+    cacheDir = str(tmp_path / 'cache')
+    runSheet(writeCsv(tmp_path / 'other.csv', [templateRow('T0')], 1), baseUrl, reporter, cacheDir=cacheDir)
+    # an uncached run created T1 and was killed before its journal entry was flushed
+    state.addTemplate({'title': 'T1', 'description': 'Description', 'canOnlyBeSentOnce': False})
+    templates_creator.runJournal(path + '.journal', baseUrl, 'org').close()
+    summary = runSheet(path, baseUrl, reporter, cacheDir=cacheDir, resume=True)
+    assert summary['changes'] == {}
+    assert [template['title'] for template in state.templates] == ['T0', 'T1']
+
+def test_export_round_trips_and_skips_templates_that_would_not_validate(tmp_path, mock, reporter):
+    state, baseUrl = mock
+    rows = [templateRow('Template ' + str(num), [('Field ' + str(field), 'ShortText') for field in range(num * 10)]) for num in range(4)]
+    path = writeCsv(tmp_path / 'sheet.csv', rows, templates_creator.maxFields)
+    runSheet(path, baseUrl, reporter)
+    state.addTemplate({'title': 'No description'})
+    for output in ['export.csv', 'export-long.csv', 'export.jsonl']:
+        exportPath = str(tmp_path / output)
+        summary = templates_creator.exportOrg('org', 'appId', 'appSecret', exportPath, baseUrl, 4, reporter,
+                                              'long' if 'long' in output else None)
+        assert summary['templates'] == 4 and summary['fields'] == 60
+        assert [skipped['title'] for skipped in summary['skipped']] == ['No description']
+        assert templates_creator.validateFile(exportPath)[1] == []
+        replanned = runSheet(exportPath, baseUrl, reporter, dryRun=True)
+        assert replanned['changes'] == {} and replanned['error'] is None
+    with open(str(tmp_path / 'export.jsonl')) as infile:
+        records = [json.loads(line) for line in infile]
+    assert sorted(len(record['fields']) for record in records) == [0, 10, 20, 30]
@@ -0,0 +1,128 @@
+import json
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+import templates_creator
+
+class headers:
+    def __init__(self, value):
+        self.headers = {'Retry-After': value} if value is not None else {}
+
+class scriptedAdapter(HTTPAdapter):
+    '''Answers each request with the next status (or exception) in `script`, then 200.'''
+    def __init__(self, *script):
+        HTTPAdapter.__init__(self)
+        self.script = list(script)
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request.method + ' ' + request.url)
+        outcome = self.script.pop(0) if self.script else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response.headers['Retry-After'] = '0'
+        response._content = b'{}'
+        response.request = request
+        response.url = request.url
+        return response
+
+def scriptedSession(*script, retries=3):
+    session = templates_creator.meritSession('https://api.example.com/v2/', 4, retries=retries, backoff=0.001)
+    adapter = scriptedAdapter(*script)
+    session.mount('https://', adapter)
+    return session, adapter
+
+def newSession(baseUrl, reporter, retries=3, **options):
+    session = templates_creator.meritSession(baseUrl, 4, timeout=5, retries=retries, backoff=0.001, **options)
+    session.login('org', 'appId', 'appSecret', reporter)
+    return session
+
+def test_retry_after():
+    assert templates_creator.retryAfter(headers('2.5')) == 2.5
+    assert templates_creator.retryAfter(headers('-1')) == 0.0
+    assert 50 < templates_creator.retryAfter(headers(formatdate(time.time() + 60, usegmt=True))) <= 60
+    assert templates_creator.retryAfter(headers(None)) is None
+    assert templates_creator.retryAfter(headers('soon')) is None
+
+def test_server_errors_are_retried():
+    session, adapter = scriptedSession(503, 429, requests.ConnectionError('reset'))
+    assert session.get(session.url + 'orgs/org/fields').status_code == 200
+    assert len(adapter.sent) == 4
+
+def test_retries_run_out():
+    session, adapter = scriptedSession(503, 503, retries=1)
+    with pytest.raises(requests.HTTPError):
+        session.get(session.url + 'orgs/org/fields')
+    assert len(adapter.sent) == 2
+
+def test_post_that_timed_out_is_not_resent():
+    session, adapter = scriptedSession(requests.ReadTimeout('no response'))
+    with pytest.raises(requests.ReadTimeout):
+        session.post(session.url + 'fields', data='{}')
+    assert len(adapter.sent) == 1
+
+def test_rate_limiter_spaces_requests():
+    limiter = templates_creator.rateLimiter(50)
+    started = time.monotonic()
+    for num in range(11):
+        limiter.wait()
+    assert time.monotonic() - started >= 0.19
+
+def test_login_is_retried_without_entering_the_link_flow(mock, reporter):
+    state, baseUrl = mock
+    state.script('POST orgs/{id}/access', 429, 503)
+    session = newSession(baseUrl, reporter)
+    assert session.headers['Authorization'].startswith('Bearer ')
+
+def test_ambiguous_post_failures_are_not_retried(mock, reporter):
+    state, baseUrl = mock
+    session = newSession(baseUrl, reporter)
+    state.script('POST fields', 502)
+    with pytest.raises(requests.HTTPError):
+        session.post(baseUrl + 'fields', data=json.dumps({'name': 'F', 'fieldType': 'ShortText'}))
+    assert state.stats == {'POST orgs/{id}/access 200': 1, 'POST fields 502': 1}
+    state.script('POST fields', 503)
+    session.post(baseUrl + 'fields', data=json.dumps({'name': 'F', 'fieldType': 'ShortText'}))
+    assert state.stats['POST fields 200'] == 1
+
+def test_expired_token_is_refreshed(mock, reporter):
+    state, baseUrl = mock
+    session = newSession(baseUrl, reporter)
+    expired = session.headers['Authorization']
+    state.tokens.clear()
+    assert session.get(baseUrl + 'orgs/org/fields').status_code == 200
+    assert session.headers['Authorization'] != expired
+    assert state.stats['GET orgs/{id}/fields 401'] == 1
+
+def test_failed_refresh_raises_a_requests_exception(mock, reporter):
+    state, baseUrl = mock
+    session = newSession(baseUrl, reporter, retries=1)
+    state.tokens.clear()
+    state.script('POST orgs/{id}/access', 403)
+    with pytest.raises(requests.RequestException):
+        session.get(baseUrl + 'orgs/org/fields')
+
+def test_bytes_sent_counts_encoded_bytes(mock, reporter):
+    state, baseUrl = mock
+    metrics = templates_creator.runMetrics()
+    session = newSession(baseUrl, reporter, metrics=metrics)
+    body = json.dumps({'name': 'é' * 10, 'fieldType': 'ShortText'}, ensure_ascii=False)
+    session.post(baseUrl + 'fields', data=body)
+    assert metrics.report()['endpoints']['POST fields']['bytesSent'] == len(body.encode('utf-8'))
+
+def test_rate_limiter_is_shared_between_sessions(mock, reporter):
+    state, baseUrl = mock
+    limiter = templates_creator.rateLimiter(20)
+    sessions = [newSession(baseUrl, reporter, limiter=limiter) for num in range(3)]
+    started = time.monotonic()
+    for num in range(10):
+        for session in sessions:
+            session.get(baseUrl + 'orgs/org/fields')
+    # 30 GETs at 20 per second across all sessions take about 1.5s; separate limiters would allow each session 20 per second
+    assert time.monotonic() - started >= 1.3
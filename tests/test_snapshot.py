@@ -0,0 +1,76 @@
+import os
+import time
+
+import templates_creator
+
+class fakeOrg:
+    '''Stands in for getTemplates/getFields, recording the cursors asked for.'''
+    def __init__(self, templates, fields):
+        self.templates = templates
+        self.fields = fields
+        self.cursors = []
+
+    def getTemplates(self, org, cursor=None):
+        self.cursors.append(cursor)
+        start = 0 if cursor is None else int(cursor)
+        return self.templates[start:], str(len(self.templates))
+
+    def getFields(self, org):
+        return self.fields
+
+def snapshotFor(tmp_path, monkeypatch, org, **options):
+    monkeypatch.setattr(templates_creator, 'getTemplates', org.getTemplates)
+    monkeypatch.setattr(templates_creator, 'getFields', org.getFields)
+    return templates_creator.orgSnapshot(str(tmp_path / 'cache'), 'https://api.example.com/v2/', 'org', **options)
+
+def test_fresh_snapshot_is_used_without_api_calls(tmp_path, monkeypatch):
+    org = fakeOrg([{'id': 't1', 'title': 'T1'}], [{'id': 'f1', 'fieldName': 'F1'}])
+    snapshot = snapshotFor(tmp_path, monkeypatch, org)
+    templates, fields = snapshot.load(None)
+    snapshot.save(templates + [{'id': 't2', 'title': 'T2'}], fields)
+    assert os.listdir(str(tmp_path / 'cache')) == ['api.example.com-org.json']
+    org.templates = []
+    assert snapshotFor(tmp_path, monkeypatch, org).load(None) == ([{'id': 't1', 'title': 'T1'}, {'id': 't2', 'title': 'T2'}],
+                                                              [{'id': 'f1', 'fieldName': 'F1'}])
+    assert org.cursors == [None]
+
+def test_expired_snapshot_is_fetched_in_full(tmp_path, monkeypatch):
+    org = fakeOrg([{'id': 't1', 'title': 'T1'}], [])
+    snapshot = snapshotFor(tmp_path, monkeypatch, org, ttl=60)
+    snapshot.save(*snapshot.load(None))
+    snapshot.fetchedAt = time.time() - 120
+    snapshot.save([], [])
+    assert snapshotFor(tmp_path, monkeypatch, org, ttl=60).load(None)[0] == [{'id': 't1', 'title': 'T1'}]
+    assert org.cursors == [None, None]
+
+def test_delta_fetches_templates_after_the_cursor(tmp_path, monkeypatch):
+    org = fakeOrg([{'id': 't1', 'title': 'T1'}], [])
+    snapshot = snapshotFor(tmp_path, monkeypatch, org)
+    snapshot.save(*snapshot.load(None))
+    org.templates.append({'id': 't2', 'title': 'T2'})
+    org.fields = [{'id': 'f1', 'fieldName': 'F1'}]
+    templates, fields = snapshotFor(tmp_path, monkeypatch, org, delta=True).load(None)
+    assert [template['id'] for template in templates] == ['t1', 't2']
+    assert fields == [{'id': 'f1', 'fieldName': 'F1'}]
+    assert org.cursors == [None, '1']
+
+def test_invalidate_forces_a_full_fetch(tmp_path, monkeypatch):
+    org = fakeOrg([], [])
+    snapshot = snapshotFor(tmp_path, monkeypatch, org)
+    snapshot.save(*snapshot.load(None))
+    snapshot.invalidate()
+    snapshot.invalidate()
+    snapshotFor(tmp_path, monkeypatch, org).load(None)
+    assert org.cursors == [None, None]
+
+def test_snapshot_of_an_unfinished_run_is_refreshed_with_a_delta(tmp_path, monkeypatch):
+    org = fakeOrg([{'id': 't1', 'title': 'T1'}], [])
+    snapshot = snapshotFor(tmp_path, monkeypatch, org)
+    snapshot.save(*snapshot.load(None))
+    snapshot.begin()
+    org.templates.append({'id': 't2', 'title': 'T2'})
+    snapshot = snapshotFor(tmp_path, monkeypatch, org)
+    assert [template['id'] for template in snapshot.load(None)[0]] == ['t1', 't2']
+    snapshot.save([], [])
+    snapshotFor(tmp_path, monkeypatch, org).load(None)
+    assert org.cursors == [None, '1']
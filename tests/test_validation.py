@@ -0,0 +1,98 @@
+import json
+
+import templates_creator
+from conftest import templateRow, writeCsv
+
+def errorRules(errors):
+    return [(error['row'], error['col'], error['rule']) for error in errors]
+
+def test_valid_row_has_no_errors():
+    validator = templates_creator.rowValidator(templates_creator.headerRow)
+    row = templateRow('Title', [('Field', 'ShortText')])
+    row += [''] * (len(templates_creator.headerRow) - len(row))
+    assert validator.errors(2, row) == []
+
+def test_every_broken_rule_is_reported_once_per_cell():
+    validator = templates_creator.rowValidator(templates_creator.layoutHeader(2))
+    row = ['', 'd' * 161, 'maybe', 'short', ''] + ['Field', 'Text', '', 'yes', 'FALSE', ''] + [''] * 6
+    assert errorRules(validator.errors(7, row)) == [
+        (7, 1, 'required'), (7, 2, 'maxLength'), (7, 3, 'trueFalse'), (7, 4, 'idLength'),
+        (7, 7, 'fieldType'), (7, 8, 'required'), (7, 9, 'trueFalse')]
+
+def test_column_count_mismatch():
+    validator = templates_creator.rowValidator(templates_creator.layoutHeader(2))
+    assert errorRules(validator.errors(3, ['Title'])) == [(3, None, 'columnCount')]
+
+def test_unused_field_group_is_skipped():
+    validator = templates_creator.rowValidator(templates_creator.layoutHeader(2))
+    assert validator.errors(2, templateRow('Title') + [''] * 12) == []
+
+def test_blank_field_name_with_other_cells_filled_is_an_error():
+    validator = templates_creator.rowValidator(templates_creator.layoutHeader(1))
+    row = ['Title', 'Description', 'FALSE', '', '', '', 'ShortText', 'desc', 'TRUE', 'FALSE', '']
+    assert errorRules(validator.errors(2, row)) == [(2, 6, 'required')]
+
+def test_header_layouts():
+    assert templates_creator.headerLayout(templates_creator.headerRow) == 'wide'
+    assert templates_creator.headerLayout(templates_creator.layoutHeader(templates_creator.maxFields)) == 'wide'
+    assert templates_creator.headerLayout(templates_creator.layoutHeader(1)) == 'long'
+    assert templates_creator.headerLayout(templates_creator.headerRow[:-1]) is None
+
+def test_input_chunks_never_split_quoted_line_breaks(tmp_path):
+    rows = [templateRow('Title ' + str(num), description='line one\n"quoted" line two' if num % 3 == 0 else 'plain')
+            for num in range(10)]
+    path = writeCsv(tmp_path / 'sheet.csv', rows, 1)
+    chunks = list(templates_creator.inputChunks(path, 4))
+    assert [num for num, text in chunks] == [2, 6, 10]
+    parsed = [templates_creator.validateChunk(templates_creator.layoutHeader(1), num, text) for num, text in chunks]
+    assert [rows for rows, errors in parsed] == [4, 4, 2]
+
+def test_validate_file_reports_every_error_in_row_order(tmp_path):
+    rows = [templateRow('Title ' + str(num), [('Field', 'ShortText')]) for num in range(50)]
+    rows[3][2] = 'maybe'
+    rows[20][6] = 'Bad'
+    rows[49][0] = ''
+    path = writeCsv(tmp_path / 'sheet.csv', rows, 2)
+    expected = [(5, 3, 'trueFalse'), (22, 7, 'fieldType'), (51, 1, 'required')]
+    for processes in [1, 2]:
+        total, errors = templates_creator.validateFile(path, processes, chunkSize=8)
+        assert total == 50
+        assert errorRules(errors) == expected
+
+def test_validate_file_rejects_unknown_header(tmp_path):
+    path = tmp_path / 'sheet.csv'
+    path.write_text('title,description\nA,B\n')
+    total, errors = templates_creator.validateFile(str(path))
+    assert errorRules(errors) == [(1, None, 'header')]
+
+def test_long_layout_groups_consecutive_rows_by_title(tmp_path):
+    rows = [templateRow('A', [('f1', 'ShortText')]), templateRow(' A ', [('f2', 'Date')]),
+            templateRow('B'), templateRow('A', [('f3', 'Name')])]
+    path = writeCsv(tmp_path / 'long.csv', rows, 1)
+    templates = [(num, lastRow, template.title, [field.fieldName for field in template.additionalFields])
+                 for num, lastRow, errors, template in templates_creator.inputTemplates(path)]
+    assert templates == [(2, 3, 'A', ['f1', 'f2']), (4, 4, 'B', []), (5, 5, 'A', ['f3'])]
+
+def test_json_lines_records(tmp_path):
+    path = tmp_path / 'templates.jsonl'
+    records = [
+        {'title': 'A', 'description': 'd', 'canOnlyBeSentOnce': True,
+         'fields': [{'name': 'f%d' % num, 'fieldType': 'ShortText', 'description': 'd', 'newEnabled': True, 'newRequired': False}
+                    for num in range(40)]},
+        {'title': 'B', 'description': 'd', 'canOnlyBeSentOnce': 'FALSE', 'fields': [{'name': 'x', 'fieldType': 'Bad', 'description': 'd',
+                                                                                      'newEnabled': True, 'newRequired': False}]},
+    ]
+    path.write_text('\n'.join(json.dumps(record) for record in records) + '\n\n')
+    results = list(templates_creator.inputTemplates(str(path)))
+    assert len(results[0][3].additionalFields) == 40
+    assert results[0][3].canOnlyBeSentOnce is True
+    assert [(error['column'], error['rule']) for error in results[1][2]] == [('fields[0].fieldType', 'fieldType')]
+
+def test_json_lines_unknown_keys_and_missing_names_are_rejected():
+    row, error = templates_creator.recordRow(1, json.dumps({'title': 'A', 'description': 'd', 'canOnlyBeSentOnce': False,
+                                                            'fields': [{'fieldName': 'X', 'fieldType': 'ShortText'}]}))
+    assert row is None and error['rule'] == 'json' and 'fields[0].fieldName' in error['message']
+    row, error = templates_creator.recordRow(2, json.dumps({'title': 'A', 'fields': [{'fieldType': 'ShortText'}]}))
+    assert row is None and error['column'] == 'fields[0].name'
+    row, error = templates_creator.recordRow(3, 'not json')
+    assert row is None and error['rule'] == 'json'